@@ -23,9 +23,11 @@ OUTPUT_DIR = r"E:\Document\petrochina\知识问答工作流平台\output"
 # SUMMARY_SENTENCES: 生成摘要的句子数量
 # KEYWORDS_TOP_N: 提取关键词的数量
 # SHORT_TEXT_THRESHOLD: 判断为短文本的字符阈值
+# META_MIN_CHARS: 去除表格和代码块后正文少于该字符数时跳过摘要和关键词提取
 SUMMARY_SENTENCES = 3
 KEYWORDS_TOP_N = 10
 SHORT_TEXT_THRESHOLD = 20
+META_MIN_CHARS = 200
 
 # 预训练模型相关配置
 # MODEL_CACHE_DIR: 模型缓存目录路径
@@ -34,7 +36,51 @@ SHORT_TEXT_THRESHOLD = 20
 MODEL_CACHE_DIR = BASE_DIR / "models"
 EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"
 USE_LOCAL_MODELS = True
+# QUANTIZE_EMBED: 关键词嵌入模型的推理精度
+#                 "fp16": GPU可用时以半精度运行（无GPU时按fp32运行）
+#                 "int8": 在CPU上对线性层做动态int8量化
+#                 "fp32": 不做任何转换
+QUANTIZE_EMBED = "fp16"
 
 # PDF处理相关配置
 # USE_GPU_FOR_OCR: 是否使用GPU加速OCR处理
-USE_GPU_FOR_OCR = True
\ No newline at end of file
+# OCR_WORKERS: 并行OCR的进程数。CPU模式（Linux/macOS）下子进程通过fork共享已加载的模型；
+#              GPU模式下子进程以spawn方式启动，各自加载模型
+#              可通过环境变量 OCR_CONCURRENCY 覆盖，无需修改配置文件
+# OCR_GPU_IDS: GPU模式并行OCR时使用的GPU编号，按顺序轮流分配给各子进程
+USE_GPU_FOR_OCR = True
+OCR_WORKERS = max(1, int(os.environ.get("OCR_CONCURRENCY", "1")))
+OCR_GPU_IDS = [0]
+# OCR_WORK_ITEM_PAGES: 并行OCR时每个工作单元的目标页数，小文件合并为一个单元提交给子进程，
+#                      避免逐个文件调度导致子进程空闲等待
+OCR_WORK_ITEM_PAGES = 500
+# CPU_TEXT_REC_BATCH_SIZE: CPU模式下文本识别的批大小，较小的值可显著降低Paddle内存池占用
+CPU_TEXT_REC_BATCH_SIZE = 1
+# RELEASE_EVERY: GPU模式下每OCR这么多个文档清理一次CUDA缓存，
+#                防止长时间批量处理时显存持续增长；设为0则不主动释放
+RELEASE_EVERY = 50
+# OCR_WARMUP: 模型加载后先用一张空白图片预热，避免首个文档承担cuDNN算法选择和显存池分配的耗时
+OCR_WARMUP = True
+# OCR_CUDNN_EXHAUSTIVE_SEARCH: GPU模式下启用cuDNN卷积算法穷举搜索。每遇到新的输入尺寸都会重新搜索，
+#                              而各页面尺寸通常不同，因此默认关闭，仅在输入尺寸固定时开启
+OCR_CUDNN_EXHAUSTIVE_SEARCH = False
+
+# PDF文本层相关配置
+# USE_PDF_TEXT_LAYER: 是否优先使用PDF自带的文本层（需要pypdfium2），跳过不必要的OCR
+# TEXT_LAYER_MIN_CHARS: 页面文本层少于该字符数时视为扫描页，需要OCR
+USE_PDF_TEXT_LAYER = True
+TEXT_LAYER_MIN_CHARS = 100
+
+# OCR批处理相关配置
+# OCR_PAGE_BATCH_SIZE: 每次送入OCR模型的最大页数
+# OCR_BATCH_TIMEOUT: 凑批等待的最长时间（秒），超时后不足一批也立即识别
+OCR_PAGE_BATCH_SIZE = 16
+OCR_BATCH_TIMEOUT = 0.2
+
+# 输出缓存相关配置
+# USE_OUTPUT_CACHE: 输入文件内容未变化时跳过重复处理
+# CACHE_VERSION: 缓存版本号，处理逻辑变化时递增以使旧缓存失效
+USE_OUTPUT_CACHE = True
+CACHE_VERSION = 1
+# USE_METADATA_CACHE: 按文本内容缓存元数据提取结果（摘要、关键词），保存在 MODEL_CACHE_DIR/meta_cache
+USE_METADATA_CACHE = True
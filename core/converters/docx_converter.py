@@ -4,55 +4,111 @@ Word文档转换器模块
 此模块提供Word文档(.docx)转换为Markdown文件的功能。
 """
 
-import json
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from docx import Document
+from docx.oxml.ns import qn
 from pathlib import Path
 from tqdm import tqdm
 
 import config
 from core.utils import (
     clean_markdown, extract_metadata, save_images,
-    ensure_dir, is_temp_file, is_short_text,
+    ensure_dir, is_temp_file,
     combine_text_fragments, write_json_file,
-    post_process_markdown_content
+    post_process_markdown_content, dump_json_file, write_text_file,
+    compute_cache_key, lookup_output_cache, save_output_cache, iter_files,
+    retry_call
 )
 
-def extract_table_data(table):
-    """提取表格数据"""
-    headers = [cell.text.strip() for cell in table.rows[0].cells] if table.rows else []
-    data_rows = []
+logger = logging.getLogger(__name__)
+
+# 正文元素的完整限定标签名，循环中直接比较而不做字符串后缀扫描
+_P_TAG = qn('w:p')
+_TBL_TAG = qn('w:tbl')
+
+def read_table_rows(table):
+    """读取表格每行的单元格文本
+    
+    单元格文本只读取一次，供Markdown输出和表格数据提取共用。
+    """
+    return [[cell.text.strip() for cell in row.cells] for row in table.rows]
+
+def extract_table_data(rows):
+    """提取表格数据
+    
+    Args:
+        rows (list): read_table_rows 返回的单元格文本列表
+    """
+    headers = rows[0] if rows else []
     
-    for row in table.rows[1:]:
-        row_data = {}
-        for i, cell in enumerate(row.cells):
-            key = headers[i] if i < len(headers) else f"列{i+1}"
-            row_data[key] = cell.text.strip()
-        if row_data:
-            data_rows.append(row_data)
+    # 超出表头的列使用默认列名，每个表格只生成一次
+    width = max((len(cells) for cells in rows), default=0)
+    keys = headers + [f"列{i+1}" for i in range(len(headers), width)]
+    data_rows = [dict(zip(keys, cells)) for cells in rows[1:] if cells]
     
     return headers, data_rows
 
-def process_paragraph(para, pending_short_text):
-    """处理段落文本"""
+# 样式名称 -> 分类结果 的缓存，同一文档中样式种类很少
+_STYLE_CACHE = {}
+
+def _classify_style(style_name):
+    """根据样式名称判断段落类型
+    
+    Returns:
+        tuple: ('heading', 级别)、('list_num',)、('list_bul',) 或 ('body',)
+    """
+    if style_name.startswith('Heading'):
+        last = style_name.split()[-1]
+        return ('heading', int(last) if last.isdigit() else 2)
+    if 'List' in style_name:
+        return ('list_num',) if 'Number' in style_name else ('list_bul',)
+    return ('body',)
+
+def process_paragraph(para, pending_short_text, short_threshold):
+    """处理段落文本
+    
+    短文本暂存到 pending_short_text 中（原地修改），遇到长文本时与其合并输出。
+    
+    Args:
+        para: python-docx 段落对象
+        pending_short_text (list): 尚未输出的短文本
+        short_threshold (int): 判断为短文本的字符阈值
+        
+    Returns:
+        str: 需要输出的Markdown内容，可能为空字符串
+    """
     text = para.text.strip()
+    style_name = para.style.name
+    style_info = _STYLE_CACHE.get(style_name)
+    if style_info is None:
+        style_info = _STYLE_CACHE[style_name] = _classify_style(style_name)
+    kind = style_info[0]
     
     # 处理标题
-    if para.style.name.startswith('Heading'):
-        level = int(para.style.name.split()[-1]) if para.style.name.split()[-1].isdigit() else 2
-        return f"{'#' * level} {text}\n\n", []
+    if kind == 'heading':
+        pending_short_text.clear()
+        return f"{'#' * style_info[1]} {text}\n\n"
     
     # 处理列表
-    if 'List' in para.style.name:
-        prefix = '1. ' if 'Number' in para.style.name else '- '
-        return f"{prefix}{text}\n", []
+    if kind == 'list_num':
+        pending_short_text.clear()
+        return f"1. {text}\n"
+    if kind == 'list_bul':
+        pending_short_text.clear()
+        return f"- {text}\n"
     
-    # 处理短文本
-    if is_short_text(text, config.SHORT_TEXT_THRESHOLD):
-        return "", pending_short_text + [text]
+    # 处理短文本（text 已去除首尾空白）
+    pending_short_text.append(text)
+    if len(text) < short_threshold:
+        return ""
     
     # 处理长文本
-    return combine_text_fragments(pending_short_text + [text]) + "\n\n", []
-
+    content = combine_text_fragments(pending_short_text) + "\n\n"
+    pending_short_text.clear()
+    return content
 
 
 def save_table_as_json_txt(table_data, output_folder, table_index, file_base_name):
@@ -65,56 +121,69 @@ def save_table_as_json_txt(table_data, output_folder, table_index, file_base_nam
     
     # 保存表格数据为JSON格式
     try:
-        with open(table_file_path, 'w', encoding='utf-8') as f:
-            json.dump(table_data, f, ensure_ascii=False, indent=2)
-        print(f"  - 已生成表格文件: {table_filename}")
+        dump_json_file(table_data, table_file_path)
+        logger.debug(f"  - 已生成表格文件: {table_filename}")
         return table_file_path
     except Exception as e:
-        print(f"  - 保存表格文件失败: {str(e)}")
+        logger.warning(f"保存表格文件失败 {table_filename}: {str(e)}")
         return None
 
-def convert_docx_to_markdown(docx_path, output_folder):
-    """将Word文档转换为Markdown格式"""
+def convert_docx_to_markdown(docx_path, output_folder, source=None):
+    """将Word文档转换为Markdown格式
+    
+    Args:
+        docx_path (str|Path): Word文档路径，用于标题、表格文件命名
+        output_folder (str|Path): 输出目录
+        source (file-like, optional): 已读入内存的文档内容（如BytesIO），提供时不再读取docx_path
+    """
     docx_path, output_folder = Path(docx_path), Path(output_folder)
     
     try:
-        doc = Document(docx_path)
+        # 文件被其他程序占用等临时性错误时退避重试
+        doc = retry_call(Document, docx_path if source is None else source)
     except Exception as e:
-        print(f"无法打开文档 {docx_path}: {str(e)}")
+        logger.error(f"无法打开文档 {docx_path}: {str(e)}")
         return "", [], {}
     
     title = getattr(doc.core_properties, 'title', docx_path.stem)
     md_lines = [f"# {title}\n\n"]
     tables_data = []
     pending_short_text = []
+    short_threshold = config.SHORT_TEXT_THRESHOLD
     metadata = extract_metadata(doc)
     
+    # 预先建立XML元素到段落对象的映射，避免每个段落都线性查找
+    para_map = {p._element: p for p in doc.paragraphs}
+    table_iter = iter(doc.tables)
+    
     for element in doc.element.body:
+        tag = element.tag
         # 处理段落
-        if element.tag.endswith('p'):
-            para = next((p for p in doc.paragraphs if p._element is element), None)
+        if tag == _P_TAG:
+            para = para_map.get(element)
             if para:
-                content, pending_short_text = process_paragraph(para, pending_short_text)
+                content = process_paragraph(para, pending_short_text, short_threshold)
                 if content:
                     md_lines.append(content)
         
         # 处理表格
-        elif element.tag.endswith('tbl'):
-            table = doc.tables[len(tables_data)]
+        elif tag == _TBL_TAG:
+            table = next(table_iter)
             # 处理待处理的短文本
             if pending_short_text:
                 md_lines.append(combine_text_fragments(pending_short_text) + "\n\n")
-                pending_short_text = []
+                pending_short_text.clear()
             
             # 表格处理：使用纯文本
-            for row in table.rows:
-                row_text = " | ".join(cell.text.strip() for cell in row.cells)
+            rows = read_table_rows(table)
+            for cells in rows:
+                row_text = " | ".join(cells)
                 if row_text:
                     md_lines.append(f"| {row_text} |\n")
             md_lines.append("\n")
             
             # 提取表格数据
-            headers, data_rows = extract_table_data(table)
+            headers, data_rows = extract_table_data(rows)
             table_data = {"headers": headers, "data": data_rows}
             tables_data.append(table_data)
             
@@ -140,57 +209,89 @@ def process_single_docx(input_path, output_folder):
     input_path, output_folder = Path(input_path), Path(output_folder)
     
     if is_temp_file(input_path):
-        print(f"⚠️ 跳过临时文件: {input_path.name}")
+        logger.info(f"⚠️ 跳过临时文件: {input_path.name}")
         return False
     
     base_name = input_path.stem
     output_subfolder = ensure_dir(output_folder / base_name)
+    md_file = output_subfolder / f"{base_name}.md"
+    cache_dir = output_folder / ".cache"
     
     try:
+        # 文件内容未变化时直接复用上次的输出
+        cache_key = None
+        if config.USE_OUTPUT_CACHE:
+            cache_key = compute_cache_key(input_path, config.EMBEDDING_MODEL_NAME, config.CACHE_VERSION)
+            if lookup_output_cache(cache_dir, cache_key, md_file):
+                logger.info(f"⏩ 文件未变化，跳过: {input_path.name}")
+                return True
+        
         md_content, tables_data, metadata = convert_docx_to_markdown(input_path, output_subfolder)
         
         # 保存文件
-        (output_subfolder / f"{base_name}.md").write_text(md_content, encoding='utf-8')
+        write_text_file(md_content, md_file)
         write_json_file(metadata, output_subfolder / f"{base_name}_metadata.json")
         
         if tables_data:
             write_json_file(tables_data, output_subfolder / f"{base_name}_tables.json")
         
-        print(f"✅ 成功转换: {input_path.name}")
-        print(f"  输出目录: {output_subfolder}")
+        if cache_key:
+            save_output_cache(cache_dir, cache_key, md_file, input_path)
+        
+        logger.info(f"✅ 成功转换: {input_path.name}")
+        logger.debug(f"  输出目录: {output_subfolder}")
         return True
     except Exception as e:
-        print(f"❌ 处理失败: {input_path.name} - {str(e)}")
+        logger.error(f"❌ 处理失败: {input_path.name} - {str(e)}")
         return False
 
-def convert_batch(input_folder, output_folder, file_extensions=None):
-    """批量转换Word文档"""
+def convert_batch(input_folder, output_folder, file_extensions=None, max_workers=None):
+    """批量转换Word文档
+    
+    各文档之间相互独立，使用进程池并行转换。
+    
+    Args:
+        input_folder (str|Path): 输入文件夹
+        output_folder (str|Path): 输出文件夹
+        file_extensions (list, optional): 需要处理的文件扩展名
+        max_workers (int, optional): 最大进程数，默认为CPU核心数
+        
+    Returns:
+        tuple: (成功数量, 文件总数)
+    """
     file_extensions = file_extensions or ['.docx', '.doc']
     input_path, output_folder = Path(input_folder), Path(output_folder)
     
     if not input_path.exists():
-        print(f"错误: 输入文件夹 '{input_path}' 不存在")
+        logger.error(f"输入文件夹 '{input_path}' 不存在")
         return 0, 0
     
     ensure_dir(output_folder)
-    doc_files = [f for f in input_path.iterdir() 
-                if str(f.suffix).lower() in file_extensions and not is_temp_file(f)]
+    doc_files = [f for f in iter_files(input_path, file_extensions) if not is_temp_file(f)]
     
     if not doc_files:
-        print(f"在 {input_folder} 中没有找到Word文档")
+        logger.warning(f"在 {input_folder} 中没有找到Word文档")
         return 0, 0
     
-    print(f"找到 {len(doc_files)} 个Word文档，开始转换...")
-    success_count = 0
+    logger.info(f"找到 {len(doc_files)} 个Word文档，开始转换...")
+    max_workers = min(len(doc_files), max_workers or os.cpu_count() or 1)
+    worker = partial(process_single_docx, output_folder=output_folder)
     
-    for doc_file in tqdm(doc_files, desc="转换文档"):
-        if process_single_docx(doc_file, output_folder):
-            success_count += 1
+    # 进度由tqdm显示，转换期间只输出警告和错误
+    previous_level = logger.level
+    logger.setLevel(logging.WARNING)
+    try:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            results = list(tqdm(executor.map(worker, doc_files), total=len(doc_files), desc="转换文档",
+                                mininterval=0.5, miniters=max(1, len(doc_files) // 200)))
+    finally:
+        logger.setLevel(previous_level)
+    success_count = sum(1 for ok in results if ok)
 
-    print("\n" + "=" * 50)
-    print(f"处理完成! 成功转换: {success_count}/{len(doc_files)}")
-    print(f"输出目录: {Path(output_folder).absolute()}")
-    print("=" * 50)
+    logger.info("=" * 50)
+    logger.info(f"处理完成! 成功转换: {success_count}/{len(doc_files)}")
+    logger.info(f"输出目录: {Path(output_folder).absolute()}")
+    logger.info("=" * 50)
     
     return success_count, len(doc_files)
 
@@ -198,7 +299,8 @@ def convert_batch(input_folder, output_folder, file_extensions=None):
 def main():
     """作为独立模块运行时的入口点"""
     import sys
-    import os
+    
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
     
     # 添加项目根目录到路径
     sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
@@ -5,7 +5,7 @@ PDF文档转换器模块
 """
 
 import time
-import json
+import logging
 import re
 from pathlib import Path
 import os
@@ -13,53 +13,416 @@ import shutil
 import config
 import gc
 import atexit
+import functools
+import multiprocessing
+import queue
 import tempfile
+import threading
 import uuid
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
 from core.utils import (
     clean_markdown, 
     combine_text_fragments,
     clean_ocr_text,
     clean_table_line,
     normalize_markdown_structure,
-    post_process_markdown_content
+    post_process_markdown_content,
+    dump_json_file,
+    write_text_file,
+    compute_cache_key,
+    lookup_output_cache,
+    save_output_cache,
+    iter_files,
+    write_bytes_file,
+    retry_call,
+    RETRYABLE_ERRORS
 )
 
-# 全局变量存储pipeline实例
+logger = logging.getLogger(__name__)
+
+# OCR推理时可重试的错误：除文件被占用等临时性错误外，还包括显存/内存暂时不足
+_OCR_RETRYABLE_ERRORS = RETRYABLE_ERRORS + (MemoryError,)
+
+# 全局变量存储pipeline实例，多个转换器及线程共享同一个模型
 _pipeline = None
 _pipeline_initialized = False
+_pipeline_lock = threading.Lock()
+# 自上次释放显存以来OCR处理的文档数，多个线程可能同时更新，由锁保护
+_docs_since_release = 0
+_release_lock = threading.Lock()
+# 退出清理函数只注册一次
+_atexit_registered = False
 
 supported_extensions = ['.pdf', '.jpg', '.jpeg', '.png', '.bmp', '.tif', '.tiff']
+_SUPPORTED_EXTS = frozenset(ext.lower() for ext in supported_extensions)
 
-def get_pipeline():
-    """获取或初始化PaddleOCR pipeline"""
-    global _pipeline, _pipeline_initialized
+def get_pipeline(warmup=True):
+    """获取或初始化PaddleOCR pipeline
     
-    if not _pipeline_initialized:
-        try:
-            from paddleocr import PPStructureV3
-            device = 'gpu' if config.USE_GPU_FOR_OCR else 'cpu'
-            _pipeline = PPStructureV3(device=device)
-            _pipeline_initialized = True
-            print("OCR模型加载完成")
-            
-            # 注册程序退出时的清理函数
-            atexit.register(cleanup_resources)
-        except Exception as e:
-            print(f"初始化OCR模型失败: {str(e)}")
-            _pipeline = None
+    模型只在首次调用时加载，之后所有调用方共享同一个实例。
+    使用双重检查加锁，避免多线程同时加载模型。
+    
+    Args:
+        warmup (bool): 加载后是否按 OCR_WARMUP 执行预热推理。
+            即将fork子进程时应关闭，由各子进程在fork后自行预热
+    """
+    global _pipeline, _pipeline_initialized, _atexit_registered
+    
+    if _pipeline_initialized:
+        return _pipeline
+    
+    with _pipeline_lock:
+        if not _pipeline_initialized:
+            try:
+                from paddleocr import PPStructureV3
+                if config.USE_GPU_FOR_OCR:
+                    if config.OCR_CUDNN_EXHAUSTIVE_SEARCH:
+                        # 导入paddleocr时paddle已读取过FLAGS_*环境变量，须通过set_flags设置
+                        import paddle
+                        paddle.set_flags({"FLAGS_cudnn_exhaustive_search": True})
+                    _pipeline = PPStructureV3(device='gpu')
+                else:
+                    # CPU推理时内存池大小随识别批大小增长
+                    _pipeline = PPStructureV3(
+                        device='cpu',
+                        text_recognition_batch_size=config.CPU_TEXT_REC_BATCH_SIZE
+                    )
+                logger.info("OCR模型加载完成")
+                
+                if warmup and config.OCR_WARMUP:
+                    _warmup(_pipeline)
+                
+                # 注册程序退出时的清理函数（cleanup_resources后重新加载时不重复注册）
+                if not _atexit_registered:
+                    atexit.register(cleanup_resources)
+                    _atexit_registered = True
+            except Exception as e:
+                logger.error(f"初始化OCR模型失败: {str(e)}")
+                _pipeline = None
             _pipeline_initialized = True
     
     return _pipeline
 
-def process_document(input_file, output_root):
+def _warmup(pipeline):
+    """用一张空白图片执行一次推理，提前完成显存池分配和cuDNN算法选择
+    
+    预热失败不影响正常处理，只记录警告。
+    """
+    warmup_path = None
+    try:
+        from PIL import Image
+        start_time = time.time()
+        warmup_path = Path(tempfile.gettempdir()) / f"warmup_{uuid.uuid4().hex}.png"
+        Image.new("RGB", (800, 600), "white").save(warmup_path)
+        for _ in pipeline.predict(str(warmup_path)):
+            pass
+        logger.info(f"OCR模型预热完成，耗时: {time.time() - start_time:.2f}秒")
+    except Exception as e:
+        logger.warning(f"OCR模型预热失败: {str(e)}")
+    finally:
+        if warmup_path is not None and warmup_path.exists():
+            try:
+                warmup_path.unlink()
+            except OSError:
+                pass
+
+@functools.lru_cache(maxsize=4)
+def _get_extractor(summary_sentences, keywords_count):
+    """按参数缓存元数据提取器，批量处理时只创建一次"""
+    from core.metadata_extractor import MetadataExtractor
+    return MetadataExtractor(
+        summary_sentences=summary_sentences,
+        keywords_count=keywords_count
+    )
+
+def _import_pdfium():
+    """导入pypdfium2，未安装时返回None"""
+    try:
+        import pypdfium2 as pdfium
+        return pdfium
+    except ImportError:
+        return None
+
+def _read_text_layer(file_path):
+    """读取PDF自带的文本层
+    
+    Returns:
+        list | None: 每页的文本；非PDF文件、未安装pypdfium2或读取失败时返回None
+    """
+    if file_path.suffix.lower() != '.pdf':
+        return None
+    pdfium = _import_pdfium()
+    if pdfium is None:
+        return None
+    
+    try:
+        pdf = pdfium.PdfDocument(str(file_path))
+        try:
+            page_texts = []
+            for page in pdf:
+                textpage = page.get_textpage()
+                page_texts.append(textpage.get_text_range().replace("\r\n", "\n"))
+                textpage.close()
+                page.close()
+            return page_texts
+        finally:
+            pdf.close()
+    except Exception as e:
+        logger.debug(f"  - 读取PDF文本层失败，使用OCR: {str(e)}")
+        return None
+
+def _collect_markdown(output):
+    """收集OCR结果中每页的Markdown信息和图片"""
+    markdown_list = []
+    markdown_images = []
+    for res in output:
+        md_info = res.markdown
+        markdown_list.append(md_info)
+        markdown_images.append(md_info.get("markdown_images", {}))
+    return markdown_list, markdown_images
+
+def _render_pages(pdfium, file_path, page_indices, page_queue, errors, stop_event):
+    """渲染线程：逐页渲染为BGR数组放入队列，结束时放入None"""
+    try:
+        pdf = pdfium.PdfDocument(str(file_path))
+        try:
+            if page_indices is None:
+                page_indices = range(len(pdf))
+            for index in page_indices:
+                if stop_event.is_set():
+                    break
+                page = pdf[index]
+                page_queue.put((index, page.render(scale=2).to_numpy()))
+                page.close()
+        finally:
+            pdf.close()
+    except Exception as e:
+        errors.append(e)
+    finally:
+        page_queue.put(None)
+
+def _ocr_pdf_pages(pipeline, file_path, page_indices=None):
+    """边渲染边识别PDF页面
+    
+    渲染线程把页面图片放入有界队列，当前线程攒够 OCR_PAGE_BATCH_SIZE 页
+    或等待超过 OCR_BATCH_TIMEOUT 秒后调用一次 predict，使页面渲染与模型推理重叠。
+    
+    Args:
+        page_indices (list, optional): 需要识别的页码，默认识别全部页面
+        
+    Returns:
+        tuple: (按页序排列的Markdown信息列表, 图片列表)
+    """
+    pdfium = _import_pdfium()
+    batch_size = max(1, config.OCR_PAGE_BATCH_SIZE)
+    page_queue = queue.Queue(maxsize=batch_size * 2)
+    errors = []
+    stop_event = threading.Event()
+    renderer = threading.Thread(
+        target=_render_pages,
+        args=(pdfium, file_path, page_indices, page_queue, errors, stop_event),
+        daemon=True
+    )
+    renderer.start()
+    
+    results = {}
+    finished = False
+    try:
+        while not finished:
+            item = page_queue.get()
+            if item is None:
+                break
+            batch = [item]
+            deadline = time.monotonic() + config.OCR_BATCH_TIMEOUT
+            while len(batch) < batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = page_queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    finished = True
+                    break
+                batch.append(item)
+            
+            indices = [index for index, _ in batch]
+            images = [image for _, image in batch]
+            for index, res in zip(indices, pipeline.predict(images)):
+                results[index] = res
+    except BaseException:
+        # 识别失败时通知渲染线程停止，并清空队列避免其阻塞在put上
+        stop_event.set()
+        while renderer.is_alive():
+            try:
+                page_queue.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        raise
+    
+    renderer.join()
+    if errors:
+        raise errors[0]
+    
+    return _collect_markdown(results[index] for index in sorted(results))
+
+def _ocr_selected_pages(pipeline, file_path, page_texts, ocr_pages):
+    """只对缺少文本层的页面进行OCR，其余页面使用文本层内容
+    
+    Returns:
+        tuple: (按页序拼接的Markdown文本, OCR页面中的图片列表)
+    """
+    markdown_list, markdown_images = _ocr_pdf_pages(pipeline, file_path, ocr_pages)
+    ocr_markdown = dict(zip(sorted(ocr_pages), markdown_list))
+    
+    parts = []
+    for index, text in enumerate(page_texts):
+        if index in ocr_markdown:
+            parts.append(pipeline.concatenate_markdown_pages([ocr_markdown[index]]))
+        else:
+            parts.append(text.strip())
+    return "\n\n".join(parts), markdown_images
+
+def _retry_ocr(fn, *args):
+    """执行OCR推理，遇到临时性错误或显存不足时清理CUDA缓存后退避重试"""
+    return retry_call(fn, *args, errors=_OCR_RETRYABLE_ERRORS, on_retry=_empty_cuda_cache)
+
+def _remove_output_folder(output_folder):
+    """处理失败时删除不完整的输出目录"""
+    if output_folder and output_folder.exists():
+        try:
+            shutil.rmtree(output_folder)
+        except Exception as clean_error:
+            logger.warning(f"清理输出目录失败: {str(clean_error)}")
+
+def _link_or_copy(src, dst):
+    """为src创建一个临时入口dst，依次尝试硬链接、符号链接，都失败时才复制文件
+    
+    硬链接和符号链接都不复制文件内容，删除dst不影响原文件。
+    """
+    try:
+        os.link(src, dst)
+        return
+    except OSError:
+        pass
+    try:
+        os.symlink(os.path.abspath(src), dst)
+        return
+    except OSError:
+        pass
+    shutil.copy2(src, dst)
+
+def _save_markdown_image(image, img_path):
+    """保存OCR结果中的图片
+    
+    已编码的字节或磁盘上的图片文件直接复制，不经过PIL重新编码；
+    shutil.copyfile 在Linux上使用sendfile在内核中完成复制。
+    只有PIL图像对象才调用 save 进行编码。
+    """
+    if isinstance(image, (bytes, bytearray, memoryview)):
+        write_bytes_file(image, img_path)
+    elif isinstance(image, (str, os.PathLike)):
+        shutil.copyfile(image, img_path)
+    elif img_path.suffix.lower() == '.png':
+        # 最低压缩级别编码速度约为默认级别的数倍，文件略大
+        image.save(img_path, compress_level=1)
+    else:
+        image.save(img_path)
+
+def _persist_outputs(file_path, output_folder, cleaned_markdown, markdown_images,
+                     cache_dir, cache_key, start_time):
+    """保存OCR结果：Markdown、图片、元数据、表格文件及缓存条目
+    
+    不依赖OCR模型，可以在I/O线程中执行，与下一个文档的OCR重叠。
+    
+    Returns:
+        bool: 保存成功返回True，否则返回False
+    """
+    try:
+        img_folder = output_folder / "imgs"
+        mkd_file_path = output_folder / f"{file_path.stem}.md"
+        
+        # 保存输出
+        write_text_file(cleaned_markdown, mkd_file_path)
+        # 元数据或表格生成失败时输出不完整，不写入缓存条目，下次运行重新处理
+        incomplete = False
+
+        # 保存图片：PIL编码时释放GIL，交给线程池与元数据提取并行执行。
+        # 线程池退出时等待所有图片写完，出错删除输出目录时不会有线程仍在写入
+        with ThreadPoolExecutor(max_workers=4) as image_pool:
+            image_futures = []
+            for item in markdown_images:
+                if item:
+                    for path, image in item.items():
+                        filename = Path(path).name
+                        img_path = img_folder / filename
+                        image_futures.append(image_pool.submit(_save_markdown_image, image, img_path))
+            
+            # 生成元数据
+            try:
+                extractor = _get_extractor(config.SUMMARY_SENTENCES, config.KEYWORDS_TOP_N)
+                # 使用清洗后的文本进行元数据提取
+                content_meta = extractor.extract(cleaned_markdown)
+                
+                meta_file = output_folder / f"{file_path.stem}_metadata.json"
+                dump_json_file(content_meta, meta_file)
+                
+                logger.debug(f"  - 已生成元数据: {meta_file.name}")
+            except Exception as meta_error:
+                incomplete = True
+                logger.warning(f"元数据生成失败 {file_path.name}: {str(meta_error)}")
+            
+            # 从Markdown文本中提取表格并生成JSON txt文件（直接使用内存中的文本）
+            try:
+                from core.utils import extract_tables_from_markdown_text
+                table_files = extract_tables_from_markdown_text(cleaned_markdown, output_folder, file_path.stem)
+                if table_files:
+                    logger.debug(f"  - 已生成 {len(table_files)} 个表格文件")
+            except Exception as table_error:
+                incomplete = True
+                logger.warning(f"表格文件生成失败 {file_path.name}: {str(table_error)}")
+        
+        # 任一图片保存失败时视为处理失败
+        for future in image_futures:
+            future.result()
+        
+        if cache_key and not incomplete:
+            save_output_cache(cache_dir, cache_key, mkd_file_path, file_path)
+                    
+        logger.info(f"完成处理: {file_path.name}")
+        logger.debug(f"  - 耗时: {time.time()-start_time:.2f}秒")
+        logger.debug(f"  - 输出位置: {output_folder}")
+        
+        return True
+    except Exception as e:
+        logger.error(f"保存文件 {file_path.name} 的处理结果时出错: {str(e)}")
+        _remove_output_folder(output_folder)
+        return False
+
+def process_document(input_file, output_root, pipeline=None, io_executor=None):
+    """处理单个PDF或图片文件
+    
+    Args:
+        input_file (str): 输入文件路径
+        output_root (str|Path): 输出根目录
+        pipeline (optional): 已加载的OCR pipeline，默认使用共享实例
+        io_executor (ThreadPoolExecutor, optional): 用于保存结果的线程池。
+            传入时OCR完成后即返回，结果写出在后台进行
+        
+    Returns:
+        bool | Future: 处理成功返回True，否则返回False；
+            传入io_executor且OCR成功时返回结果为bool的Future
+    """
     file_path = Path(input_file)
-    if file_path.suffix.lower() not in supported_extensions:
+    if file_path.suffix.lower() not in _SUPPORTED_EXTS:
         raise ValueError(f"不支持的文件类型: {file_path.suffix}")
     
     start_time = time.time()
-    print(f"\n开始处理: {file_path.name}")
+    logger.debug(f"开始处理: {file_path.name}")
     output_folder = None
     temp_file_path = None
+    used_ocr = False
     
     try:
         # 准备目录
@@ -67,110 +430,251 @@ def process_document(input_file, output_root):
             raise FileNotFoundError(f"文件不存在: {file_path}")
         
         output_folder = Path(output_root) / file_path.stem
+        mkd_file_path = output_folder / f"{file_path.stem}.md"
+        
+        # 文件内容未变化时直接复用上次的输出，跳过OCR
+        cache_dir = Path(output_root) / ".cache"
+        cache_key = None
+        if config.USE_OUTPUT_CACHE:
+            # 文本层相关配置会改变输出内容，一并计入缓存键
+            cache_key = compute_cache_key(file_path, config.EMBEDDING_MODEL_NAME, config.CACHE_VERSION,
+                                          config.USE_PDF_TEXT_LAYER, config.TEXT_LAYER_MIN_CHARS)
+            if lookup_output_cache(cache_dir, cache_key, mkd_file_path):
+                logger.info(f"文件未变化，使用缓存结果: {file_path.name}")
+                return True
+        
         output_folder.mkdir(parents=True, exist_ok=True)
         img_folder = output_folder / "imgs"
         img_folder.mkdir(exist_ok=True, parents=True)
 
-        # 获取pipeline实例
-        pipeline = get_pipeline()
-        if pipeline is None:
-            raise RuntimeError("OCR模型未能正确初始化")
+        # 优先使用PDF自带的文本层，只对缺少文本的页面进行OCR
+        page_texts = _read_text_layer(file_path) if config.USE_PDF_TEXT_LAYER else None
+        ocr_pages = None
+        if page_texts:
+            ocr_pages = [index for index, text in enumerate(page_texts)
+                         if len(text.strip()) < config.TEXT_LAYER_MIN_CHARS]
 
-        # 处理中文路径问题：如果路径包含非ASCII字符，则复制到临时文件
-        processing_file_path = str(file_path)
-        try:
-            # 检查路径是否包含非ASCII字符
-            str(file_path).encode('ascii')
-        except UnicodeEncodeError:
-            # 路径包含中文或其他非ASCII字符，创建临时文件
-            print("  - 检测到中文路径，创建临时文件...")
-            temp_dir = tempfile.gettempdir()
-            temp_filename = f"temp_{uuid.uuid4().hex}{file_path.suffix}"
-            temp_file_path = Path(temp_dir) / temp_filename
-            shutil.copy2(file_path, temp_file_path)
-            processing_file_path = str(temp_file_path)
-            print(f"  - 临时文件: {temp_file_path}")
-
-        # 处理文件
-        output = pipeline.predict(processing_file_path)
-        markdown_list = []
-        markdown_images = []
-
-        for res in output:
-            md_info = res.markdown
-            markdown_list.append(md_info)
-            markdown_images.append(md_info.get("markdown_images", {}))
-    
-        markdown_texts = pipeline.concatenate_markdown_pages(markdown_list)
+        if page_texts and not ocr_pages:
+            logger.debug("  - PDF包含完整文本层，跳过OCR")
+            markdown_texts = "\n\n".join(text.strip() for text in page_texts)
+            markdown_images = []
+        else:
+            used_ocr = True
+            # 获取pipeline实例
+            if pipeline is None:
+                pipeline = get_pipeline()
+            if pipeline is None:
+                raise RuntimeError("OCR模型未能正确初始化")
+
+            if page_texts:
+                logger.debug(f"  - {len(ocr_pages)}/{len(page_texts)} 页缺少文本层，仅对这些页面OCR")
+                markdown_texts, markdown_images = _retry_ocr(
+                    _ocr_selected_pages, pipeline, file_path, page_texts, ocr_pages)
+            elif file_path.suffix.lower() == '.pdf' and _import_pdfium() is not None:
+                markdown_list, markdown_images = _retry_ocr(_ocr_pdf_pages, pipeline, file_path)
+                markdown_texts = pipeline.concatenate_markdown_pages(markdown_list)
+            else:
+                # 处理中文路径问题：如果路径包含非ASCII字符，则复制到临时文件
+                processing_file_path = str(file_path)
+                try:
+                    # 检查路径是否包含非ASCII字符
+                    str(file_path).encode('ascii')
+                except UnicodeEncodeError:
+                    # 路径包含中文或其他非ASCII字符，创建临时文件
+                    logger.debug("  - 检测到中文路径，创建临时文件...")
+                    temp_dir = tempfile.gettempdir()
+                    temp_filename = f"temp_{uuid.uuid4().hex}{file_path.suffix}"
+                    temp_file_path = Path(temp_dir) / temp_filename
+                    _link_or_copy(file_path, temp_file_path)
+                    processing_file_path = str(temp_file_path)
+                    logger.debug(f"  - 临时文件: {temp_file_path}")
+
+                # 处理文件
+                output = _retry_ocr(pipeline.predict, processing_file_path)
+                markdown_list, markdown_images = _collect_markdown(output)
+                markdown_texts = pipeline.concatenate_markdown_pages(markdown_list)
         
         # 应用文本清洗和标准化处理
-        print("  - 正在清洗和标准化文本...")
+        logger.debug("  - 正在清洗和标准化文本...")
         cleaned_markdown = post_process_markdown_content(markdown_texts)
-
-        # 保存输出
-        mkd_file_path = output_folder / f"{file_path.stem}.md"
-        with open(mkd_file_path, "w", encoding="utf-8") as f:
-            f.write(cleaned_markdown)
-
-        # 保存图片
-        for item in markdown_images:
-            if item:
-                for path, image in item.items():
-                    filename = Path(path).name
-                    img_path = img_folder / filename
-                    image.save(img_path)
-        
-        # 生成元数据
-        try:
-            from core.metadata_extractor import MetadataExtractor
-            extractor = MetadataExtractor(
-                summary_sentences=config.SUMMARY_SENTENCES,
-                keywords_count=config.KEYWORDS_TOP_N
-            )
-            # 使用清洗后的文本进行元数据提取
-            content_meta = extractor.extract(cleaned_markdown)
-            
-            meta_file = output_folder / f"{file_path.stem}_metadata.json"
-            with open(meta_file, 'w', encoding='utf-8') as f:
-                json.dump(content_meta, f, ensure_ascii=False, indent=2)
-            
-            print(f"  - 已生成元数据: {meta_file.name}")
-        except Exception as meta_error:
-            print(f"  - 元数据生成失败: {str(meta_error)}")
-        
-        # 从生成的Markdown文件中提取表格并生成JSON txt文件
-        try:
-            from core.utils import extract_tables_from_markdown_and_save_json
-            table_files = extract_tables_from_markdown_and_save_json(mkd_file_path, output_folder)
-            if table_files:
-                print(f"  - 已生成 {len(table_files)} 个表格文件")
-        except Exception as table_error:
-            print(f"  - 表格文件生成失败: {str(table_error)}")
-                    
-        print(f"完成处理: {file_path.name}")
-        print(f"  - 耗时: {time.time()-start_time:.2f}秒")
-        print(f"  - 输出位置: {output_folder}")
-        
-        return True
+        # 清洗前的拼接文本和逐页识别结果不再需要，在写出结果前释放以降低大文档的内存峰值
+        markdown_texts = markdown_list = output = None
     except Exception as e:
-        print(f"处理文件 {file_path.name} 时出错: {str(e)}")
-        if output_folder and output_folder.exists():
-            try:
-                shutil.rmtree(output_folder)
-            except Exception as clean_error:
-                print(f"清理输出目录失败: {str(clean_error)}")
+        logger.error(f"处理文件 {file_path.name} 时出错: {str(e)}")
+        _remove_output_folder(output_folder)
         return False
     finally:
         # 清理临时文件
         if temp_file_path and temp_file_path.exists():
             try:
                 temp_file_path.unlink()
-                print("  - 已清理临时文件")
+                logger.debug("  - 已清理临时文件")
             except Exception as temp_error:
-                print(f"  - 清理临时文件失败: {str(temp_error)}")
+                logger.warning(f"清理临时文件失败: {str(temp_error)}")
+    
+    if used_ocr:
+        _maybe_release_gpu_memory()
+    
+    persist_args = (file_path, output_folder, cleaned_markdown, markdown_images,
+                    cache_dir, cache_key, start_time)
+    if io_executor is not None:
+        return io_executor.submit(_persist_outputs, *persist_args)
+    return _persist_outputs(*persist_args)
+
+def _empty_cuda_cache():
+    """清理Paddle的CUDA缓存，paddle不可用时忽略"""
+    try:
+        import paddle
+        if hasattr(paddle, 'device') and hasattr(paddle.device, 'cuda'):
+            if paddle.device.cuda.device_count() > 0:
+                paddle.device.cuda.empty_cache()
+                return True
+    except Exception:
+        pass  # 忽略paddle相关的清理错误
+    return False
+
+def _maybe_release_gpu_memory():
+    """按 RELEASE_EVERY 策略释放显存
+    
+    每OCR RELEASE_EVERY 个文档清理一次CUDA缓存。模型本身不释放：共享的pipeline
+    可能正被其他线程用于推理，不能在此处销毁。
+    """
+    global _docs_since_release
+    
+    if not config.USE_GPU_FOR_OCR or config.RELEASE_EVERY <= 0:
+        return
+    
+    with _release_lock:
+        _docs_since_release += 1
+        should_release = _docs_since_release % config.RELEASE_EVERY == 0
+    if should_release and _empty_cuda_cache():
+        logger.debug("  - 已清理CUDA缓存")
+
+def _quick_page_count(file_path):
+    """快速获取文档页数，只读取PDF的页面目录而不解析页面内容
+    
+    图片文件、未安装pypdfium2或读取失败时按1页计。
+    """
+    if Path(file_path).suffix.lower() != '.pdf':
+        return 1
+    pdfium = _import_pdfium()
+    if pdfium is None:
+        return 1
+    try:
+        pdf = pdfium.PdfDocument(str(file_path))
+        try:
+            return max(1, len(pdf))
+        finally:
+            pdf.close()
+    except Exception:
+        return 1
 
-def process_directory(input_root, output_root):
-    """处理指定目录下的所有支持的文档（PDF及图片）"""
+def _chunk_by_pages(files, target, max_files):
+    """按页数将文件分组为工作单元，每组累计页数达到target或文件数达到max_files即截断
+    
+    小文件合并提交可减少进程间调度开销，单个大文件独占一个工作单元；
+    页数在产出过程中逐个统计，调用方可以边分组边提交。
+    
+    Yields:
+        list: 保持原有顺序的一组文件路径（str）
+    """
+    batch = []
+    pages = 0
+    for file_path in files:
+        batch.append(str(file_path))
+        pages += _quick_page_count(file_path)
+        if pages >= target or len(batch) >= max_files:
+            yield batch
+            batch = []
+            pages = 0
+    if batch:
+        yield batch
+
+def _process_work_item(file_paths, output_root):
+    """在子进程中顺序处理一个工作单元内的所有文件
+    
+    Returns:
+        list: 与file_paths顺序一致的处理结果（bool）
+    """
+    return [process_document(file_path, output_root) for file_path in file_paths]
+
+def _map_work_items(executor, files, output_root, workers):
+    """将文件按页数分组提交到进程池，返回与files顺序一致的处理结果（bool）
+    
+    每个工作单元最多包含 ceil(文件数 / 进程数) 个文件，保证至少有workers个单元，
+    总页数较少时也能分摊到所有进程；每组统计完页数即提交，不必等全部文件统计完。
+    """
+    max_files = max(1, -(-len(files) // workers))
+    futures = [executor.submit(_process_work_item, work_item, output_root)
+               for work_item in _chunk_by_pages(files, config.OCR_WORK_ITEM_PAGES, max_files)]
+    results = []
+    for future in futures:
+        results.extend(future.result())
+    return results
+
+def _can_fork_workers():
+    """判断是否可以用fork子进程共享已加载的模型
+    
+    CUDA上下文无法在fork后继续使用，因此只在POSIX系统的CPU模式下启用。
+    """
+    return os.name == 'posix' and not config.USE_GPU_FOR_OCR
+
+def _process_in_forked_workers(files, output_root, workers):
+    """在fork出的子进程中并行处理文件
+    
+    先在父进程中加载模型，子进程通过写时复制继承模型内存，不会重复加载。
+    父进程不执行预热推理：推理会初始化OpenMP/MKLDNN线程池，fork后继承的线程池
+    可能导致子进程卡死，因此预热放到各子进程中进行。
+    
+    Returns:
+        list: 与files顺序一致的处理结果（bool）
+    """
+    get_pipeline(warmup=False)
+    context = multiprocessing.get_context('fork')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                             initializer=_init_forked_worker) as executor:
+        return _map_work_items(executor, files, output_root, workers)
+
+def _init_forked_worker():
+    """fork子进程初始化：在子进程中预热继承来的模型"""
+    if config.OCR_WARMUP and _pipeline is not None:
+        _warmup(_pipeline)
+
+def _init_gpu_worker(gpu_queue):
+    """GPU进程池初始化：为子进程分配一块GPU
+    
+    需要在导入paddle之前设置 CUDA_VISIBLE_DEVICES，模型在首次处理文档时加载。
+    """
+    os.environ["CUDA_VISIBLE_DEVICES"] = str(gpu_queue.get())
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+def _process_in_gpu_workers(files, output_root, workers):
+    """在多个GPU子进程中并行处理文件
+    
+    使用spawn方式启动子进程，避免fork后CUDA上下文不可用；
+    子进程按 OCR_GPU_IDS 轮流绑定GPU，进程数即为同时占用显存的模型数。
+    
+    Returns:
+        list: 与files顺序一致的处理结果（bool）
+    """
+    gpu_ids = list(config.OCR_GPU_IDS) or [0]
+    context = multiprocessing.get_context('spawn')
+    gpu_queue = context.Queue()
+    for worker_index in range(workers):
+        gpu_queue.put(gpu_ids[worker_index % len(gpu_ids)])
+    
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                             initializer=_init_gpu_worker, initargs=(gpu_queue,)) as executor:
+        return _map_work_items(executor, files, output_root, workers)
+
+def process_directory(input_root, output_root, files=None):
+    """处理指定目录下的所有支持的文档（PDF及图片）
+    
+    Args:
+        input_root (str|Path): 输入目录
+        output_root (str|Path): 输出目录
+        files (list, optional): 调用方已收集好的待处理文件列表，提供时不再遍历input_root
+    """
     # 确保目录存在
     Path(input_root).mkdir(parents=True, exist_ok=True)
     Path(output_root).mkdir(parents=True, exist_ok=True)
@@ -179,26 +683,44 @@ def process_directory(input_root, output_root):
     processed_files = 0
     failed_files = []
     
-    all_files_to_process = []
-    for ext in supported_extensions:
-        all_files_to_process.extend(Path(input_root).glob(f"**/*{ext}"))
+    if files is None:
+        all_files_to_process = list(iter_files(input_root, _SUPPORTED_EXTS, recursive=True))
+    else:
+        all_files_to_process = list(files)
 
     total_files = len(all_files_to_process)
 
     if total_files > 0:
-        for file_path in all_files_to_process:
-            if process_document(str(file_path), output_root):
+        workers = min(config.OCR_WORKERS, total_files)
+        if workers > 1 and config.USE_GPU_FOR_OCR:
+            results = list(zip(all_files_to_process,
+                               _process_in_gpu_workers(all_files_to_process, output_root, workers)))
+        elif workers > 1 and _can_fork_workers():
+            results = list(zip(all_files_to_process,
+                               _process_in_forked_workers(all_files_to_process, output_root, workers)))
+        else:
+            # OCR在主线程顺序执行，结果写出交给I/O线程，与下一个文档的OCR重叠
+            results = []
+            with ThreadPoolExecutor(max_workers=4) as io_executor:
+                for file_path in all_files_to_process:
+                    results.append((file_path, process_document(str(file_path), output_root,
+                                                                 io_executor=io_executor)))
+        
+        for file_path, result in results:
+            if isinstance(result, Future):
+                result = result.result()
+            if result:
                 processed_files += 1
             else:
                 failed_files.append(str(file_path))
     
-    print(f"\nPDF及图片处理完成! 共找到 {total_files} 个文件")
-    print(f"  - 成功处理: {processed_files} 个文件")
+    logger.info(f"PDF及图片处理完成! 共找到 {total_files} 个文件")
+    logger.info(f"  - 成功处理: {processed_files} 个文件")
     
     if failed_files:
-        print(f"  - 处理失败: {len(failed_files)} 个文件")
+        logger.info(f"  - 处理失败: {len(failed_files)} 个文件")
         for f in failed_files:
-            print(f"    - {f}")
+            logger.info(f"    - {f}")
             
     return processed_files, total_files
 
@@ -210,53 +732,49 @@ def cleanup_resources():
     global _pipeline, _pipeline_initialized
     
     try:
-        if _pipeline is not None:
-            print("正在清理OCR资源...")
-            
-            # 尝试各种可能的清理方法
-            cleanup_methods = ['cleanup', 'close', 'release', '__del__']
-            for method_name in cleanup_methods:
-                if hasattr(_pipeline, method_name):
-                    try:
-                        method = getattr(_pipeline, method_name)
-                        if callable(method):
-                            method()
-                            print(f"  - 调用了 {method_name} 方法")
-                            break
-                    except Exception as e:
-                        print(f"  - 调用 {method_name} 失败: {str(e)}")
-                        continue
-            
-            # 清理可能的内部属性
-            if hasattr(_pipeline, '__dict__'):
-                for attr_name in list(_pipeline.__dict__.keys()):
-                    try:
-                        delattr(_pipeline, attr_name)
-                    except:
-                        pass
-            
-            # 设置为None
-            _pipeline = None
-            _pipeline_initialized = False
-            
-            # 强制垃圾回收
-            gc.collect()
-            
-            print("OCR资源清理完成")
+        with _pipeline_lock:
+            if _pipeline is not None:
+                logger.info("正在清理OCR资源...")
+                
+                # 尝试各种可能的清理方法
+                cleanup_methods = ['cleanup', 'close', 'release', '__del__']
+                for method_name in cleanup_methods:
+                    if hasattr(_pipeline, method_name):
+                        try:
+                            method = getattr(_pipeline, method_name)
+                            if callable(method):
+                                method()
+                                logger.debug(f"  - 调用了 {method_name} 方法")
+                                break
+                        except Exception as e:
+                            logger.warning(f"调用 {method_name} 失败: {str(e)}")
+                            continue
+                
+                # 清理可能的内部属性
+                if hasattr(_pipeline, '__dict__'):
+                    for attr_name in list(_pipeline.__dict__.keys()):
+                        try:
+                            delattr(_pipeline, attr_name)
+                        except:
+                            pass
+                
+                # 设置为None
+                _pipeline = None
+                _pipeline_initialized = False
+                
+                # 强制垃圾回收
+                gc.collect()
+                
+                logger.info("OCR资源清理完成")
     except Exception as e:
-        print(f"清理OCR资源时出错: {str(e)}")
+        logger.error(f"清理OCR资源时出错: {str(e)}")
     
     # 额外的清理步骤 - 尝试清理PaddlePaddle相关资源
-    try:
-        import paddle
-        if hasattr(paddle, 'device') and hasattr(paddle.device, 'cuda'):
-            if paddle.device.cuda.device_count() > 0:
-                paddle.device.cuda.empty_cache()
-                print("已清理CUDA缓存")
-    except Exception as e:
-        pass  # 忽略paddle相关的清理错误
+    if _empty_cuda_cache():
+        logger.info("已清理CUDA缓存")
         
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
     input_root = r"E:\Document\petrochina\知识问答工作流平台\doc_preparation\input"
     output_root = r"E:\Document\petrochina\知识问答工作流平台\doc_preparation\output"
     try:
@@ -5,20 +5,49 @@
 """
 
 import os
-import json
+import re
+import hashlib
+import logging
+import functools
 from pathlib import Path
-from sumy.parsers.plaintext import PlaintextParser
-from sumy.nlp.tokenizers import Tokenizer
-from sumy.summarizers.lex_rank import LexRankSummarizer
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
 from keybert import KeyBERT
-import jieba
-import jieba.analyse
+try:
+    # jieba_fast为C扩展实现，接口与jieba一致，分词速度快数倍
+    import jieba_fast as jieba
+    import jieba_fast.analyse
+except ImportError:
+    import jieba
+    import jieba.analyse
+try:
+    # blake3对长文本的哈希速度约为SHA-256的数倍
+    from blake3 import blake3 as _text_hash
+except ImportError:
+    _text_hash = hashlib.sha256
 import config
 from docx import Document
+from core.utils import dump_json_file, dumps_json_bytes, load_json_file
+
+logger = logging.getLogger(__name__)
 
 # 确保模型缓存目录存在
 os.makedirs(config.MODEL_CACHE_DIR, exist_ok=True)
 
+# 元数据缓存目录
+META_CACHE_DIR = config.MODEL_CACHE_DIR / "meta_cache"
+
+def warmup_jieba():
+    """预先加载jieba词典及TF-IDF/TextRank所需资源，避免首个文档承担加载耗时"""
+    try:
+        jieba.initialize()
+        jieba.analyse.extract_tags("预热", topK=1, withWeight=True)
+        jieba.analyse.textrank("预热", topK=1, withWeight=True)
+    except Exception as e:
+        logger.warning(f"jieba预热失败: {str(e)}")
+
+warmup_jieba()
+
 def configure_model_environment():
     """配置模型运行环境"""
     if config.USE_LOCAL_MODELS:
@@ -32,7 +61,7 @@ def configure_model_environment():
         # 检查模型是否存在
         model_path = config.MODEL_CACHE_DIR / config.EMBEDDING_MODEL_NAME
         if not model_path.exists():
-            print(f"警告: 本地模型路径不存在: {model_path}")
+            logger.warning(f"警告: 本地模型路径不存在: {model_path}")
             return False
     return True
 
@@ -48,13 +77,110 @@ def read_docx_content(file_path):
         print(f"处理文件 {file_path} 时出错: {e}")
         return ""
 
+def _get_model_source():
+    """返回嵌入模型的本地路径（存在时）或模型名称"""
+    model_path = config.MODEL_CACHE_DIR / config.EMBEDDING_MODEL_NAME
+    return str(model_path) if config.USE_LOCAL_MODELS and model_path.exists() else config.EMBEDDING_MODEL_NAME
+
+@functools.lru_cache(maxsize=1)
+def _get_kw_model(model_source):
+    """加载KeyBERT模型，每个进程只加载一次
+    
+    按 config.QUANTIZE_EMBED 将嵌入模型转换为fp16（GPU）或动态int8量化（CPU）。
+    """
+    if config.QUANTIZE_EMBED not in ("fp16", "int8"):
+        return KeyBERT(model=model_source)
+    
+    import torch
+    from sentence_transformers import SentenceTransformer
+    
+    if config.QUANTIZE_EMBED == "fp16" and torch.cuda.is_available():
+        embedding_model = SentenceTransformer(model_source, device="cuda")
+        embedding_model.half()
+    elif config.QUANTIZE_EMBED == "int8":
+        embedding_model = SentenceTransformer(model_source, device="cpu")
+        embedding_model = torch.quantization.quantize_dynamic(
+            embedding_model, {torch.nn.Linear}, dtype=torch.qint8
+        )
+    else:
+        embedding_model = SentenceTransformer(model_source)
+    return KeyBERT(model=embedding_model)
+
+# 按中英文句末标点和换行切分句子，句末标点保留在句子中
+SENTENCE_PATTERN = re.compile(r'[^。！？!?\n]+[。！？!?]?')
+
+# LexRank相似度阈值及幂迭代参数
+LEXRANK_THRESHOLD = 0.1
+LEXRANK_EPSILON = 1e-4
+LEXRANK_MAX_ITER = 100
+
+# Markdown表格行及围栏代码块，判断正文长度时忽略
+TABLE_ROW_PATTERN = re.compile(r'^\s*\|.*\|\s*$', re.M)
+CODE_BLOCK_PATTERN = re.compile(r'^```.*?^```', re.M | re.S)
+
+# 字数统计：每个汉字计为一个词，其余连续的非空白字符计为一个词
+WORD_PATTERN = re.compile(r'[\u4e00-\u9fff]|[^\s\u4e00-\u9fff]+')
+
+def count_words(text):
+    """统计字数，逐个匹配计数，不生成中间的词列表"""
+    return sum(1 for _ in WORD_PATTERN.finditer(text))
+
+def has_enough_text(text):
+    """判断去除表格和代码块后的正文是否足够进行摘要和关键词提取"""
+    if len(text.strip()) < config.META_MIN_CHARS:
+        return False
+    plain = TABLE_ROW_PATTERN.sub('', CODE_BLOCK_PATTERN.sub('', text))
+    return len(plain.strip()) >= config.META_MIN_CHARS
+
+# 摘要用的词：至少含一个字母、汉字或数字，只由标点、空白组成的分词结果不参与计算
+LEXRANK_TOKEN_PATTERN = re.compile(r"[^\W_]")
+
+def tokenize_words(sentence):
+    """对句子分词并只保留词语，标点、空白等不参与句子相似度计算"""
+    return [token for token in jieba.lcut(sentence) if LEXRANK_TOKEN_PATTERN.search(token)]
+
+def split_sentences(text):
+    """将文本切分为句子列表"""
+    sentences = (m.group().strip() for m in SENTENCE_PATTERN.finditer(text))
+    return [sentence for sentence in sentences if sentence]
+
 def generate_summary(text, sentences_count=3):
-    """生成文本摘要"""
+    """生成文本摘要
+    
+    使用LexRank算法：句子TF-IDF向量两两求余弦相似度（一次稀疏矩阵乘法），
+    按阈值建图后用幂迭代求平稳分布，取得分最高的句子并按原文顺序返回。
+    """
     if not text.strip():
         return []
     
-    parser = PlaintextParser.from_string(text, Tokenizer("chinese"))
-    return LexRankSummarizer()(parser.document, sentences_count=sentences_count)
+    sentences = split_sentences(text)
+    if len(sentences) <= sentences_count:
+        return sentences
+    
+    try:
+        vectorizer = TfidfVectorizer(tokenizer=tokenize_words, token_pattern=None)
+        # TfidfVectorizer默认对每行做L2归一化，点积即余弦相似度
+        tfidf = vectorizer.fit_transform(sentences)
+    except ValueError:
+        # 句子中没有可用的词（如全部为标点或数字）
+        return sentences[:sentences_count]
+    
+    similarity = (tfidf @ tfidf.T).toarray()
+    adjacency = (similarity > LEXRANK_THRESHOLD).astype(np.float64)
+    # 保证没有有效词的句子也至少连向自身，避免除零
+    np.fill_diagonal(adjacency, 1.0)
+    transition = adjacency / adjacency.sum(axis=1, keepdims=True)
+    
+    scores = np.full(len(sentences), 1.0 / len(sentences))
+    for _ in range(LEXRANK_MAX_ITER):
+        next_scores = transition.T @ scores
+        if np.abs(next_scores - scores).sum() < LEXRANK_EPSILON:
+            scores = next_scores
+            break
+        scores = next_scores
+    
+    top_indices = np.argsort(-scores, kind='stable')[:sentences_count]
+    return [sentences[i] for i in sorted(top_indices)]
 
 def extract_keywords(text, top_n=10):
     """从文本中提取关键词"""
@@ -67,25 +193,95 @@ def extract_keywords(text, top_n=10):
         if keywords:
             return keywords
     except Exception as e:
-        print(f"jieba关键词提取失败: {str(e)}")
+        logger.error(f"jieba关键词提取失败: {str(e)}")
     
     # 备选方案：使用KeyBERT
     try:
         segmented_text = " ".join(jieba.cut(text))
-        model_path = config.MODEL_CACHE_DIR / config.EMBEDDING_MODEL_NAME
-        model_source = str(model_path) if config.USE_LOCAL_MODELS and model_path.exists() else config.EMBEDDING_MODEL_NAME
-        keywords = KeyBERT(model=model_source).extract_keywords(segmented_text, keyphrase_ngram_range=(1, 1), top_n=top_n)
+        keywords = _get_kw_model(_get_model_source()).extract_keywords(
+            segmented_text, keyphrase_ngram_range=(1, 1), top_n=top_n, use_mmr=False
+        )
         return keywords
     except Exception as e:
-        print(f"KeyBERT关键词提取错误: {str(e)}")
+        logger.error(f"KeyBERT关键词提取错误: {str(e)}")
     
     # 最后尝试使用TextRank
     try:
         return jieba.analyse.textrank(text, topK=top_n, withWeight=True)
     except Exception as e:
-        print(f"关键词提取失败: {str(e)}")
+        logger.error(f"关键词提取失败: {str(e)}")
         return []
 
+def extract_keywords_batch(texts, top_n=10):
+    """批量提取关键词，结果顺序与输入一致
+    
+    jieba未能提取关键词的文本统一交给KeyBERT处理：所有文档和候选词
+    各只做一次批量编码，而不是每个文档单独前向计算一次。
+    """
+    results = [None] * len(texts)
+    pending = []
+    
+    for i, text in enumerate(texts):
+        if not text or not isinstance(text, str) or not text.strip():
+            results[i] = []
+            continue
+        try:
+            keywords = jieba.analyse.extract_tags(text, topK=top_n, withWeight=True)
+            if keywords:
+                results[i] = keywords
+                continue
+        except Exception as e:
+            logger.error(f"jieba关键词提取失败: {str(e)}")
+        pending.append(i)
+    
+    # 备选方案：使用KeyBERT批量提取
+    if pending:
+        try:
+            segmented_texts = [" ".join(jieba.cut(texts[i])) for i in pending]
+            batch_keywords = _get_kw_model(_get_model_source()).extract_keywords(
+                segmented_texts, keyphrase_ngram_range=(1, 1), top_n=top_n, use_mmr=False
+            )
+            # 只有一个文档时KeyBERT返回的是单层列表
+            if len(segmented_texts) == 1:
+                batch_keywords = [batch_keywords]
+            for i, keywords in zip(pending, batch_keywords):
+                results[i] = keywords
+        except Exception as e:
+            logger.error(f"KeyBERT关键词提取错误: {str(e)}")
+    
+    # 最后尝试使用TextRank
+    for i in pending:
+        if results[i] is None:
+            try:
+                results[i] = jieba.analyse.textrank(texts[i], topK=top_n, withWeight=True)
+            except Exception as e:
+                logger.error(f"关键词提取失败: {str(e)}")
+                results[i] = []
+    
+    return results
+
+
+def _meta_cache_path(text, summary_sentences, keywords_count):
+    """根据文本内容和提取参数生成元数据缓存文件路径"""
+    digest = _text_hash(text.encode('utf-8')).hexdigest()
+    key = f"{digest}_{summary_sentences}_{keywords_count}_{config.EMBEDDING_MODEL_NAME}_{config.CACHE_VERSION}"
+    return META_CACHE_DIR / f"{key}.json"
+
+def _load_cached_metadata(cache_path):
+    """读取缓存的元数据，不存在或损坏时返回None"""
+    try:
+        return load_json_file(cache_path)
+    except (OSError, ValueError):
+        return None
+
+def _save_cached_metadata(cache_path, metadata):
+    """保存元数据到缓存，写入失败不影响处理结果"""
+    try:
+        META_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        dump_json_file(metadata, cache_path)
+    except Exception as e:
+        logger.warning(f"元数据缓存写入失败: {str(e)}")
+
 
 class MetadataExtractor:
     """元数据提取器类"""
@@ -94,36 +290,77 @@ class MetadataExtractor:
         self.summary_sentences = summary_sentences
         self.keywords_count = keywords_count
         
-    def extract(self, text):
-        """从文本中提取元数据"""
+    def extract(self, text, keywords=None):
+        """从文本中提取元数据
+        
+        keywords不为None时直接使用已提取好的关键词（见extract_batch）
+        """
         if not text or not isinstance(text, str):
             return {"summary": "", "keywords": {}, "char_count": 0, "word_count": 0}
         
+        # 空文本或几乎只有表格的文本不做摘要和关键词提取
+        if not has_enough_text(text):
+            return {"summary": "", "keywords": {}, "char_count": len(text), "word_count": count_words(text)}
+        
+        cache_path = None
+        if config.USE_METADATA_CACHE:
+            cache_path = _meta_cache_path(text, self.summary_sentences, self.keywords_count)
+            cached = _load_cached_metadata(cache_path)
+            if cached is not None:
+                return cached
+        
         try:
             # 生成摘要
             summary_sentences = generate_summary(text, self.summary_sentences)
             summary = " ".join([str(sentence) for sentence in summary_sentences])
             
             # 提取关键词
-            keywords = extract_keywords(text, self.keywords_count)
+            if keywords is None:
+                keywords = extract_keywords(text, self.keywords_count)
             keywords_dict = {keyword: float(score) for keyword, score in keywords}
             
-            return {
+            metadata = {
                 "summary": summary,
                 "keywords": keywords_dict,
                 "char_count": len(text),
-                "word_count": len(text.split())
+                "word_count": count_words(text)
             }
+            if cache_path is not None:
+                _save_cached_metadata(cache_path, metadata)
+            return metadata
         except Exception as e:
-            print(f"元数据提取错误: {str(e)}")
+            logger.error(f"元数据提取错误: {str(e)}")
             return {
                 "summary": "",
                 "keywords": {},
                 "char_count": len(text),
-                "word_count": len(text.split()),
+                "word_count": count_words(text),
                 "error": str(e)
             }
         
+    def extract_batch(self, texts):
+        """批量提取多段文本的元数据，结果顺序与输入一致"""
+        texts = list(texts)
+        results = [None] * len(texts)
+        
+        # 已缓存的文本直接返回缓存结果，只对其余文本批量提取关键词
+        if config.USE_METADATA_CACHE:
+            for i, text in enumerate(texts):
+                if text and isinstance(text, str):
+                    cache_path = _meta_cache_path(text, self.summary_sentences, self.keywords_count)
+                    results[i] = _load_cached_metadata(cache_path)
+        
+        # 正文不足的文本由extract直接返回空结果，不参与关键词提取
+        for i, text in enumerate(texts):
+            if results[i] is None and not (text and isinstance(text, str) and has_enough_text(text)):
+                results[i] = self.extract(text)
+        
+        pending = [i for i, result in enumerate(results) if result is None]
+        keywords_list = extract_keywords_batch([texts[i] for i in pending], self.keywords_count)
+        for i, keywords in zip(pending, keywords_list):
+            results[i] = self.extract(texts[i], keywords)
+        return results
+        
     def extract_from_file(self, file_path):
         """从文件中提取元数据"""
         file_path = Path(file_path)
@@ -159,20 +396,27 @@ def process_documents_batch(input_folder=None, summary_sentences=3, keywords_cou
     
     extractor = MetadataExtractor(summary_sentences, keywords_count)
     
+    # 先读取全部文档，再批量提取元数据，使关键词模型的编码按批进行
+    texts = {}
     for file_path in word_files:
         file_name = file_path.name
-        print(f"\n{'='*50}\n处理文件: {file_name}\n{'='*50}")
-        
         try:
-            result = extractor.extract_from_file(file_path)
-            results[file_name] = result
-            print(f"\n文件 '{file_name}' 处理结果:\n{'-'*40}")
-            print(json.dumps(result, ensure_ascii=False, indent=2))
-            print(f"{'-'*40}")
+            texts[file_name] = read_docx_content(file_path)
         except Exception as e:
             print(f"处理文件 {file_name} 失败: {str(e)}")
             results[file_name] = {"error": str(e)}
     
+    file_paths = {file_path.name: file_path for file_path in word_files}
+    metadata_list = extractor.extract_batch(texts.values())
+    
+    for file_name, result in zip(texts, metadata_list):
+        print(f"\n{'='*50}\n处理文件: {file_name}\n{'='*50}")
+        result.update({"file_path": str(file_paths[file_name]), "file_name": file_name})
+        results[file_name] = result
+        print(f"\n文件 '{file_name}' 处理结果:\n{'-'*40}")
+        print(dumps_json_bytes(result).decode('utf-8'))
+        print(f"{'-'*40}")
+    
     return results
 
 
@@ -4,17 +4,60 @@
 包含各种辅助函数，如文本清理、元数据提取、文件处理等
 """
 
+import os
 import re
-import json
+import hashlib
+import logging
+import operator
+import functools
 from pathlib import Path
 
+try:
+    import orjson
+except ImportError:  # 未安装orjson时使用标准库json
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+# 标准库json只在未安装orjson或需要非默认格式时才用到，首次使用时再导入
+_json = None
+
+def _get_json():
+    """按需导入标准库json模块"""
+    global _json
+    if _json is None:
+        import json as _json
+    return _json
+
+# 文件读写缓冲区大小，批量处理大量小文件时减少系统调用次数
+IO_BUFFER_SIZE = 128 * 1024
+
+# 文档核心属性中需要提取的文本属性
+_META_ATTRS = ('title', 'author', 'subject', 'keywords', 'comments', 'category',
+               'content_status', 'identifier', 'language', 'version')
+_get_meta_attrs = operator.attrgetter(*_META_ATTRS)
+
+# 预编译的正则表达式，避免每次调用时查找re模块的内部缓存
+_RE_NEWLINES = re.compile(r'\n{3,}')
+_RE_SPACES = re.compile(r'[ \t]{2,}')
+_RE_WS = re.compile(r'\s+')
+_RE_LIST = re.compile(r'^[-*+]\s+|^\d+\.\s+')
+# Strict Open XML格式文档中图片关系的类型（python-docx常量只包含Transitional格式）
+_STRICT_IMAGE_RELTYPE = 'http://purl.oclc.org/ooxml/officeDocument/relationships/image'
+
+# Markdown表格分隔行中可能出现的字符
+_TABLE_SEPARATOR_CHARS = frozenset('-: |')
+# 文件名中删除非法字符、空格替换为下划线的转换表
+_SAFE_FN_TABLE = str.maketrans({**{c: None for c in '\\/*?:"<>|'}, ' ': '_'})
+# 数字与单位符号/中文数量单位之间的空格
+_RE_DIGIT_UNIT = re.compile(r'(\d+)\s+([%°℃℉]|万|千|百|十|亿|元|米|公里|公斤|吨)')
+# 中文标点（逗号、句号、分号、冒号、感叹号、问号）及引号前后的空格，一次扫描全部移除
+_RE_CJK_PUNCT = re.compile(r'\s*([，。；：！？"])\s*')
+
 def clean_markdown(text):
     """清理优化Markdown文本"""
-    # 合并多个连续换行为两个换行
-    text = re.sub(r'\n{3,}', '\n\n', text)
-    # 清理多余空格
-    text = re.sub(r'[ \t]{2,}', ' ', text)
-    return text.strip()
+    # 合并多个连续换行为两个换行，再清理多余空格
+    return _RE_SPACES.sub(' ', _RE_NEWLINES.sub('\n\n', text)).strip()
 
 
 def clean_ocr_text(text):
@@ -29,40 +72,38 @@ def clean_ocr_text(text):
     Returns:
         str: 清洗后的文本
     """
+    # 短文本（表头、单位、重复的样板行）经常重复出现，结果缓存复用
+    if text and len(text) <= _CLEAN_CACHE_MAX_LEN:
+        return _clean_ocr_text_cached(text)
+    return _clean_ocr_text_impl(text)
+
+
+def _clean_ocr_text_impl(text):
+    """clean_ocr_text 的实际实现"""
     if not text or not text.strip():
         return ""
     
     # 1. 基础清洗：移除多余空白字符
-    text = re.sub(r'\s+', ' ', text.strip())
+    text = _RE_WS.sub(' ', text.strip())
+    
+    # 纯ASCII文本不含中文标点和中文单位，只有引号和%相关的规则可能生效
+    if text.isascii() and '"' not in text and '%' not in text:
+        return text
     
     # 2. 修复中文标点符号
-    chinese_punctuation_fixes = {
-        r'\s+，': '，',  # 中文逗号前后空格
-        r'，\s+': '，',
-        r'\s+。': '。',  # 中文句号前后空格
-        r'。\s+': '。',
-        r'\s+；': '；',  # 中文分号前后空格
-        r'；\s+': '；',
-        r'\s+：': '：',  # 中文冒号前后空格
-        r'：\s+': '：',
-        r'\s+！': '！',  # 中文感叹号前后空格
-        r'！\s+': '！',
-        r'\s+？': '？',  # 中文问号前后空格
-        r'？\s+': '？',
-        r'"\s+': '"',   # 中文引号处理
-        r'\s+"': '"',
-    }
-    
-    for pattern, replacement in chinese_punctuation_fixes.items():
-        text = re.sub(pattern, replacement, text)
-    
-    # 3. 处理数字和单位之间的空格
-    text = re.sub(r'(\d+)\s+([%°℃℉])', r'\1\2', text)  # 移除数字和单位符号间的空格
-    text = re.sub(r'(\d+)\s+(万|千|百|十|亿|元|米|公里|公斤|吨)', r'\1\2', text)  # 中文数量单位
+    text = _RE_CJK_PUNCT.sub(r'\1', text)
+    
+    # 3. 处理数字和单位之间的空格（单位符号及中文数量单位）
+    text = _RE_DIGIT_UNIT.sub(r'\1\2', text)
     
     return text.strip()
 
 
+# 只缓存不超过该长度的文本，缓存条目数有上限，内存占用可控
+_CLEAN_CACHE_MAX_LEN = 128
+_clean_ocr_text_cached = functools.lru_cache(maxsize=4096)(_clean_ocr_text_impl)
+
+
 def clean_table_line(table_line):
     """清洗表格行
     
@@ -78,14 +119,15 @@ def clean_table_line(table_line):
     # 分割表格单元格
     cells = table_line.split('|')[1:-1]  # 去掉首尾的空字符串
     
-    # 清洗每个单元格
-    cleaned_cells = []
-    for cell in cells:
-        cleaned_cell = clean_ocr_text(cell.strip())
-        cleaned_cells.append(cleaned_cell)
+    # 清洗每个单元格：不含引号和%的纯ASCII单元格（数字、英文）只需合并空白
+    cleaned_cells = [
+        _RE_WS.sub(' ', cell.strip()) if cell.isascii() and '"' not in cell and '%' not in cell
+        else clean_ocr_text(cell.strip())
+        for cell in cells
+    ]
     
     # 重新组装表格行
-    if any(cell.strip() for cell in cleaned_cells):  # 确保至少有一个非空单元格
+    if any(cleaned_cells):  # 确保至少有一个非空单元格（单元格已去除首尾空白）
         return '| ' + ' | '.join(cleaned_cells) + ' |'
     
     return ""
@@ -95,6 +137,7 @@ def normalize_markdown_structure(markdown_text):
     """标准化Markdown文档结构
     
     适用于PDF OCR和Word转换后的Markdown文本结构化处理。
+    单次遍历：每输出一行时即根据上一行判断是否需要插入空行。
     
     Args:
         markdown_text (str): 原始Markdown文本
@@ -105,63 +148,57 @@ def normalize_markdown_structure(markdown_text):
     if not markdown_text:
         return ""
     
-    lines = markdown_text.split('\n')
-    processed_lines = []
+    output = []
+    previous = None
     current_paragraph = []
     
-    for line in lines:
+    def emit(line):
+        nonlocal previous
+        # 在标题、段落、表格、列表之间添加适当的空行
+        if previous is not None and (previous[0] == '#' or line[0] in '#|' or _RE_LIST.match(line)):
+            output.append('')
+        output.append(line)
+        previous = line
+    
+    def flush_paragraph():
+        if current_paragraph:
+            combined_text = combine_text_fragments(current_paragraph)
+            if combined_text:
+                emit(combined_text)
+            current_paragraph.clear()
+    
+    for line in markdown_text.split('\n'):
         line = line.strip()
         
-        # 处理标题行
-        if line.startswith('#'):
-            # 先保存当前段落
-            if current_paragraph:
-                combined_text = combine_text_fragments(current_paragraph)
-                if combined_text:
-                    processed_lines.append(combined_text)
-                current_paragraph = []
-            
-            # 添加标题，确保标题格式正确
-            level = len(line) - len(line.lstrip('#'))
-            title_text = line.lstrip('#').strip()
+        # 处理空行
+        if not line:
+            flush_paragraph()
+            continue
+        
+        first_char = line[0]
+        
+        # 处理标题行，确保标题格式正确
+        if first_char == '#':
+            flush_paragraph()
+            title_text = line.lstrip('#')
+            level = len(line) - len(title_text)
+            title_text = title_text.strip()
             if title_text:
-                processed_lines.append(f"{'#' * min(level, 6)} {title_text}")
+                emit(f"{'#' * min(level, 6)} {title_text}")
             continue
         
         # 处理表格行
-        if line.startswith('|') and line.endswith('|'):
-            # 先保存当前段落
-            if current_paragraph:
-                combined_text = combine_text_fragments(current_paragraph)
-                if combined_text:
-                    processed_lines.append(combined_text)
-                current_paragraph = []
-            
-            # 清洗表格行
+        if first_char == '|' and line[-1] == '|':
+            flush_paragraph()
             cleaned_table_line = clean_table_line(line)
             if cleaned_table_line:
-                processed_lines.append(cleaned_table_line)
+                emit(cleaned_table_line)
             continue
         
         # 处理列表项
-        if re.match(r'^[-*+]\s+|^\d+\.\s+', line):
-            # 先保存当前段落
-            if current_paragraph:
-                combined_text = combine_text_fragments(current_paragraph)
-                if combined_text:
-                    processed_lines.append(combined_text)
-                current_paragraph = []
-            
-            processed_lines.append(line)
-            continue
-        
-        # 处理空行
-        if not line:
-            if current_paragraph:
-                combined_text = combine_text_fragments(current_paragraph)
-                if combined_text:
-                    processed_lines.append(combined_text)
-                current_paragraph = []
+        if (first_char in '-*+' or first_char.isdigit()) and _RE_LIST.match(line):
+            flush_paragraph()
+            emit(line)
             continue
         
         # 累积普通文本行
@@ -170,26 +207,9 @@ def normalize_markdown_structure(markdown_text):
             current_paragraph.append(cleaned_line)
     
     # 处理最后的段落
-    if current_paragraph:
-        combined_text = combine_text_fragments(current_paragraph)
-        if combined_text:
-            processed_lines.append(combined_text)
-    
-    # 组装最终文本，确保适当的行间距
-    result_lines = []
-    for i, line in enumerate(processed_lines):
-        result_lines.append(line)
-        
-        # 在标题、段落、表格、列表之间添加适当的空行
-        if i < len(processed_lines) - 1:
-            next_line = processed_lines[i + 1]
-            if (line.startswith('#') or 
-                next_line.startswith('#') or 
-                next_line.startswith('|') or 
-                re.match(r'^[-*+]\s+|^\d+\.\s+', next_line)):
-                result_lines.append('')
+    flush_paragraph()
     
-    return '\n'.join(result_lines)
+    return '\n'.join(output)
 
 
 def post_process_markdown_content(markdown_content):
@@ -203,35 +223,19 @@ def post_process_markdown_content(markdown_content):
     Returns:
         str: 处理后的Markdown内容
     """
-    # 1. 标准化结构
+    # 1. 标准化结构：输出的每一行都非空，块之间只有单个空行，无需再整理空行
     markdown_content = normalize_markdown_structure(markdown_content)
     
     # 2. 应用基础清洗
-    markdown_content = clean_markdown(markdown_content)
-    
-    # 3. 最终整理：确保文档结构清晰
-    lines = markdown_content.split('\n')
-    final_lines = []
-    
-    for i, line in enumerate(lines):
-        if line.strip():
-            final_lines.append(line)
-        elif i > 0 and i < len(lines) - 1:
-            # 保留必要的空行，但避免连续多个空行
-            if final_lines and final_lines[-1].strip():
-                final_lines.append('')
-    
-    return '\n'.join(final_lines).strip()
+    return clean_markdown(markdown_content)
 
 
 def extract_metadata(doc):
     """提取文档元数据"""
     cp = doc.core_properties
-    attrs = ['title', 'author', 'subject', 'keywords', 'comments', 'category', 
-            'content_status', 'identifier', 'language', 'version']
     
-    # 构建基本元数据
-    metadata = {attr: getattr(cp, attr, "") or "" for attr in attrs}
+    # 构建基本元数据：一次取出全部文本属性
+    metadata = dict(zip(_META_ATTRS, [value or "" for value in _get_meta_attrs(cp)]))
     
     # 处理时间属性
     metadata.update({
@@ -244,33 +248,101 @@ def extract_metadata(doc):
 
 
 def save_images(doc, output_folder):
-    """保存文档中的图片"""
+    """保存文档中的图片
+    
+    直接写出文档内嵌图片的原始字节，不做格式转换；外部链接的图片没有内嵌数据，跳过。
+    """
     saved_images = []
     try:
-        images_folder = Path(output_folder) / "imgs"
-        images_folder.mkdir(exist_ok=True, parents=True)
+        from docx.opc.constants import RELATIONSHIP_TYPE as RT
+        image_reltypes = (RT.IMAGE, _STRICT_IMAGE_RELTYPE)
+        image_rels = [(i, rel) for i, rel in enumerate(doc.part.rels.values())
+                      if rel.reltype in image_reltypes and not rel.is_external]
+        if not image_rels:
+            return saved_images
+        
+        images_folder = os.path.join(output_folder, "imgs")
+        os.makedirs(images_folder, exist_ok=True)
         
-        for i, rel in enumerate(doc.part.rels.values()):
-            if "image" in rel.target_ref:
-                img_data = rel.target_part.blob
-                ext = rel.target_ref.split('.')[-1].lower() if '.' in rel.target_ref else 'png'
-                img_name = f"image_{i+1}.{ext}"
-                img_path = images_folder / img_name
-                
-                with open(img_path, 'wb') as f:
-                    f.write(img_data)
-                saved_images.append(f"imgs/{img_name}")
+        for i, rel in image_rels:
+            ext = os.path.splitext(rel.target_ref)[1][1:].lower() or 'png'
+            img_name = f"image_{i+1}.{ext}"
+            write_bytes_file(rel.target_part.blob, os.path.join(images_folder, img_name))
+            saved_images.append(f"imgs/{img_name}")
     except Exception as e:
-        print(f"保存图片失败: {str(e)}")
+        logger.error(f"保存图片失败: {str(e)}")
     
     return saved_images
 
 
 def ensure_dir(path):
     """确保目录存在，如果不存在则创建"""
-    dir_path = Path(path)
-    dir_path.mkdir(exist_ok=True, parents=True)
-    return dir_path
+    dir_str = os.fspath(path)
+    os.makedirs(dir_str, exist_ok=True)
+    return Path(dir_str)
+
+
+def iter_files(root, extensions, recursive=False):
+    """遍历目录中指定扩展名的文件
+    
+    只遍历目录一次，按小写扩展名匹配，命中时才创建Path对象。
+    
+    Args:
+        root (str|Path): 目录路径
+        extensions (iterable): 扩展名集合，如 ('.pdf', '.png')
+        recursive (bool): 是否递归遍历子目录
+        
+    Yields:
+        Path: 匹配的文件路径
+    """
+    exts = frozenset(ext.lower() for ext in extensions)
+    if recursive:
+        for dirpath, _, filenames in os.walk(root):
+            for name in filenames:
+                if os.path.splitext(name)[1].lower() in exts:
+                    yield Path(dirpath) / name
+    else:
+        with os.scandir(root) as entries:
+            for entry in entries:
+                if entry.is_file() and os.path.splitext(entry.name)[1].lower() in exts:
+                    yield Path(entry.path)
+
+
+# 可重试的临时性错误：超时、连接中断等。Windows下文件被其他程序占用表现为PermissionError，
+# 也视为临时性错误；其他系统上权限不足不会自行恢复，不重试
+RETRYABLE_ERRORS = (TimeoutError, ConnectionError, BlockingIOError, InterruptedError)
+if os.name == 'nt':
+    RETRYABLE_ERRORS += (PermissionError,)
+
+
+def retry_call(fn, *args, retries=3, backoff=1.0, max_backoff=30.0,
+               errors=RETRYABLE_ERRORS, on_retry=None, **kwargs):
+    """调用fn，遇到临时性错误时按指数退避重试
+    
+    Args:
+        fn (callable): 被调用的函数
+        retries (int): 最多重试次数（不含首次调用）
+        backoff (float): 首次重试前的等待秒数，之后每次翻倍
+        max_backoff (float): 单次等待的最长秒数
+        errors (tuple): 视为临时性错误、需要重试的异常类型
+        on_retry (callable, optional): 每次重试前调用（无参数），如释放显存
+    
+    Returns:
+        fn 的返回值；重试次数用尽后抛出最后一次的异常，非临时性错误直接抛出
+    """
+    import time
+    
+    for attempt in range(retries + 1):
+        try:
+            return fn(*args, **kwargs)
+        except errors as e:
+            if attempt == retries:
+                raise
+            logger.warning(f"调用失败（{type(e).__name__}: {e}），{backoff:.1f}秒后重试 ({attempt + 1}/{retries})")
+            if on_retry is not None:
+                on_retry()
+            time.sleep(backoff)
+            backoff = min(backoff * 2, max_backoff)
 
 
 def is_temp_file(file_path):
@@ -290,22 +362,129 @@ def combine_text_fragments(fragments, separator=" "):
 
 def generate_safe_filename(text, max_length=100):
     """生成安全的文件名"""
-    safe_text = re.sub(r'[\\/*?:"<>|]', "", text).replace(" ", "_")
-    return (safe_text[:max_length] if len(safe_text) > max_length else safe_text) or "untitled"
+    safe_text = text.translate(_SAFE_FN_TABLE)
+    if len(safe_text) > max_length:
+        safe_text = safe_text[:max_length]
+    return safe_text or "untitled"
+
+
+def open_buffered(file_path, mode='rb'):
+    """以较大的缓冲区打开文件（二进制模式）"""
+    return open(file_path, mode, buffering=IO_BUFFER_SIZE)
+
+
+def write_bytes_file(data, file_path):
+    """将已完整在内存中的字节数据不经缓冲直接写入文件，通常只需一次write系统调用"""
+    view = memoryview(data)
+    with open(file_path, 'wb', buffering=0) as f:
+        while view:
+            view = view[f.write(view):]
+
+
+def read_text_file(file_path):
+    """以UTF-8编码一次性读取文本文件"""
+    with open_buffered(file_path, 'rb') as f:
+        return f.read().decode('utf-8')
+
+
+def write_text_file(text, file_path):
+    """将文本以UTF-8编码一次性写入文件
+
+    内容已完整在内存中，直接写入无缓冲句柄，不创建BufferedWriter和TextIOWrapper。
+    """
+    write_bytes_file(text.encode('utf-8'), file_path)
+
+
+def dumps_json_bytes(data, ensure_ascii=False, indent=2):
+    """将数据序列化为UTF-8编码的JSON字节串
+    
+    已安装orjson且不转义非ASCII时使用orjson（仅支持缩进2或紧凑格式），否则使用标准库json。
+    """
+    if orjson is not None and not ensure_ascii:
+        if indent == 2:
+            return orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+        if indent is None:
+            return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS)
+    return _get_json().dumps(data, ensure_ascii=ensure_ascii, indent=indent).encode('utf-8')
+
+
+def dump_json_file(data, file_path, ensure_ascii=False, indent=2):
+    """将数据序列化后一次性写入JSON文件，异常由调用方处理"""
+    write_bytes_file(dumps_json_bytes(data, ensure_ascii=ensure_ascii, indent=indent), file_path)
+
+
+def load_json_file(file_path):
+    """读取JSON文件，已安装orjson时直接解析字节串，异常由调用方处理"""
+    with open_buffered(file_path, 'rb') as f:
+        payload = f.read()
+    if orjson is not None:
+        return orjson.loads(payload)
+    return _get_json().loads(payload.decode('utf-8'))
 
 
 def write_json_file(data, file_path, ensure_ascii=False, indent=2):
     """将数据写入JSON文件"""
     try:
         ensure_dir(Path(file_path).parent)
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=ensure_ascii, indent=indent)
+        dump_json_file(data, file_path, ensure_ascii=ensure_ascii, indent=indent)
         return True
     except Exception as e:
-        print(f"写入JSON文件失败: {str(e)}")
+        logger.error(f"写入JSON文件失败: {str(e)}")
         return False
 
 
+def compute_file_hash(file_path, chunk_size=1 << 20, digest=None):
+    """分块计算文件内容的哈希（默认SHA-256），避免一次性读入大文件"""
+    if digest is None:
+        digest = hashlib.sha256()
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+    with open(file_path, 'rb', buffering=0) as f:
+        while True:
+            size = f.readinto(buffer)
+            if not size:
+                break
+            digest.update(view[:size])
+    return digest.hexdigest()
+
+
+def compute_cache_key(file_path, *extra, data=None):
+    """根据文件内容及附加参数（如模型名、缓存版本）生成缓存键
+    
+    data 为已读入内存的文件内容，提供时直接对其计算哈希，不再读取file_path。
+    """
+    content_hash = hashlib.sha256(data).hexdigest() if data is not None else compute_file_hash(file_path)
+    parts = [content_hash] + [str(item) for item in extra]
+    return hashlib.sha256(":".join(parts).encode('utf-8')).hexdigest()
+
+
+def lookup_output_cache(cache_dir, cache_key, md_file):
+    """查询输出缓存
+    
+    Args:
+        cache_dir (str|Path): 缓存目录
+        cache_key (str): compute_cache_key 生成的缓存键
+        md_file (str|Path): 本次处理预期生成的Markdown文件
+        
+    Returns:
+        bool: 缓存命中且对应的Markdown文件仍存在时返回True
+    """
+    entry_file = Path(cache_dir) / f"{cache_key}.json"
+    if not entry_file.exists():
+        return False
+    try:
+        entry = load_json_file(entry_file)
+    except Exception:
+        return False
+    return entry.get("md_file") == str(md_file) and Path(md_file).exists()
+
+
+def save_output_cache(cache_dir, cache_key, md_file, source_file):
+    """记录缓存条目，指向已生成的Markdown文件"""
+    entry = {"source_file": str(source_file), "md_file": str(md_file)}
+    return write_json_file(entry, Path(cache_dir) / f"{cache_key}.json")
+
+
 def save_markdown_and_metadata(markdown_content, metadata, output_path):
     """保存Markdown内容和元数据到指定路径
     
@@ -317,25 +496,27 @@ def save_markdown_and_metadata(markdown_content, metadata, output_path):
     Returns:
         tuple: (md_file_path, meta_file_path) 保存的文件路径
     """
-    output_path = Path(output_path)
-    ensure_dir(output_path.parent)
+    output_path = os.fspath(output_path)
+    ensure_dir(os.path.dirname(output_path) or '.')
     
     # 保存Markdown文件
     md_file = f"{output_path}.md"
     try:
-        with open(md_file, 'w', encoding='utf-8') as f:
-            f.write(markdown_content)
+        write_text_file(markdown_content, md_file)
     except Exception as e:
-        print(f"保存Markdown文件失败: {str(e)}")
+        logger.error(f"保存Markdown文件失败: {str(e)}")
         return None, None
     
-    # 保存元数据文件
+    # 保存元数据文件（目录已在上面确保存在，直接写入）
     meta_file = f"{output_path}_metadata.json"
-    if write_json_file(metadata, meta_file):
-        print(f"已保存: {Path(md_file).name}")
-        return md_file, meta_file
-    else:
+    try:
+        dump_json_file(metadata, meta_file)
+    except Exception as e:
+        logger.error(f"写入JSON文件失败: {str(e)}")
         return md_file, None
+    
+    logger.info(f"已保存: {os.path.basename(md_file)}")
+    return md_file, meta_file
 
 
 def extract_tables_from_markdown_and_save_json(md_file_path, output_folder=None):
@@ -346,60 +527,77 @@ def extract_tables_from_markdown_and_save_json(md_file_path, output_folder=None)
         output_folder (str|Path, optional): 输出文件夹，默认为md文件所在目录
     
     Returns:
-        list: 生成的表格JSON文件路径列表
+        list: 生成的表格JSON文件路径（str）列表
     """
-    md_file_path = Path(md_file_path)
+    base_dir, base_name = os.path.split(os.fspath(md_file_path))
     if output_folder is None:
-        output_folder = md_file_path.parent
-    else:
-        output_folder = Path(output_folder)
+        output_folder = base_dir
     
     # 读取Markdown文件
     try:
-        with open(md_file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
+        content = read_text_file(md_file_path)
     except Exception as e:
-        print(f"读取Markdown文件失败: {str(e)}")
+        logger.error(f"读取Markdown文件失败: {str(e)}")
         return []
     
-    # 使用正则表达式匹配表格
-    table_pattern = r'\|.*\|(?:\n\|.*\|)*'
-    tables = re.findall(table_pattern, content, re.MULTILINE)
+    return extract_tables_from_markdown_text(content, output_folder, os.path.splitext(base_name)[0])
+
+
+def iter_markdown_tables(content):
+    """逐行扫描Markdown文本，按连续的表格行分组
+    
+    去除首尾空白后以 | 开头并以 | 结尾的行视为表格行（与 normalize_markdown_structure 一致）。
+    
+    Yields:
+        list: 一个表格的所有行（已去除首尾空白）
+    """
+    current = []
+    for line in content.splitlines():
+        line = line.strip()
+        if len(line) > 1 and line[0] == '|' and line[-1] == '|':
+            current.append(line)
+        elif current:
+            yield current
+            current = []
+    if current:
+        yield current
+
+
+def extract_tables_from_markdown_text(content, output_folder, file_base_name):
+    """从内存中的Markdown文本提取表格并保存为JSON格式的txt文件
+    
+    Markdown内容已在内存中时使用，避免写入文件后再读回。
+    
+    Args:
+        content (str): Markdown文本
+        output_folder (str|Path): 输出文件夹
+        file_base_name (str): 表格文件名前缀
+    
+    Returns:
+        list: 生成的表格JSON文件路径（str）列表
+    """
+    output_folder = os.fspath(output_folder)
     
     generated_files = []
-    file_base_name = md_file_path.stem
     
-    for i, table_text in enumerate(tables):
-        if not table_text.strip():
-            continue
-            
-        # 解析表格
-        lines = [line.strip() for line in table_text.split('\n') if line.strip()]
-        if not lines:
-            continue
-        
-        # 提取表头和数据
-        headers = []
+    for i, lines in enumerate(iter_markdown_tables(content)):
+        # 提取表头和数据，清理表格行时移除首尾的|符号
+        headers = [cell.strip() for cell in lines[0].split('|')[1:-1]]
+        # 超出表头的列使用“列N”作为键，按需补齐
+        keys = list(headers)
         data_rows = []
         
-        for j, line in enumerate(lines):
-            # 清理表格行，移除首尾的|符号
-            cells = [cell.strip() for cell in line.split('|')[1:-1]]
+        for line in lines[1:]:
+            # 跳过分隔行（只包含 - : 空格和|，如 |---|:---:|）
+            if not set(line) - _TABLE_SEPARATOR_CHARS:
+                continue
             
-            if j == 0:
-                headers = cells
-            else:
-                # 跳过分隔行（通常包含 --- 这样的内容）
-                if all(cell.replace('-', '').replace(' ', '') == '' for cell in cells):
-                    continue
-                    
-                if cells and len(cells) > 0:
-                    row_data = {}
-                    for k, cell in enumerate(cells):
-                        key = headers[k] if k < len(headers) else f"列{k+1}"
-                        row_data[key] = cell
-                    if any(value.strip() for value in row_data.values()):  # 确保行不为空
-                        data_rows.append(row_data)
+            cells = [cell.strip() for cell in line.split('|')[1:-1]]
+            if len(cells) > len(keys):
+                keys.extend(f"列{k+1}" for k in range(len(keys), len(cells)))
+            row_data = dict(zip(keys, cells))
+            if any(row_data.values()):  # 确保行不为空（单元格已去除首尾空白）
+                data_rows.append(row_data)
         
         # 只有当表格有有效数据时才保存
         if headers and data_rows:
@@ -410,15 +608,14 @@ def extract_tables_from_markdown_and_save_json(md_file_path, output_folder=None)
             
             # 生成文件名
             table_filename = f"{file_base_name}_table_{i + 1}.txt"
-            table_file_path = output_folder / table_filename
+            table_file_path = os.path.join(output_folder, table_filename)
             
             # 保存为JSON格式的txt文件
             try:
-                with open(table_file_path, 'w', encoding='utf-8') as f:
-                    json.dump(table_data, f, ensure_ascii=False, indent=2)
-                print(f"  - 已生成表格文件: {table_filename}")
+                dump_json_file(table_data, table_file_path)
+                logger.info(f"  - 已生成表格文件: {table_filename}")
                 generated_files.append(table_file_path)
             except Exception as e:
-                print(f"  - 保存表格文件失败: {str(e)}")
+                logger.error(f"  - 保存表格文件失败: {str(e)}")
     
     return generated_files
@@ -5,13 +5,56 @@
 该模块作为整个系统的入口点，协调各个处理组件的工作流程。
 """
 
-import json
+import os
+import logging
+import functools
+import multiprocessing
+from logging.handlers import QueueHandler, QueueListener
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
 from tqdm import tqdm
 import config
-from core.converters import DocxConverter, PdfConverter
-from core.utils import ensure_dir, save_markdown_and_metadata
-from core.metadata_extractor import MetadataExtractor
+from core.utils import (
+    ensure_dir, save_markdown_and_metadata, retry_call,
+    compute_cache_key, lookup_output_cache, save_output_cache
+)
+
+logger = logging.getLogger(__name__)
+
+# 支持的文件扩展名
+WORD_EXTENSIONS = frozenset(('.docx', '.doc'))
+PDF_EXTENSIONS = frozenset(('.pdf', '.jpg', '.jpeg', '.png', '.bmp', '.tif', '.tiff'))
+
+
+def iter_documents(root):
+    """递归遍历目录，逐个产出支持的文档
+    
+    使用os.scandir逐层遍历，找到文件即产出，不预先收集完整的文件列表。
+    无法读取的目录（如权限不足）记录警告后跳过，不中断整个遍历。
+    
+    Yields:
+        tuple: (kind, Path)，kind为 'word' 或 'pdf'（PDF及图片）
+    """
+    try:
+        entries = os.scandir(root)
+    except OSError as e:
+        logger.warning(f"无法读取目录，已跳过: {root} ({e})")
+        return
+    with entries:
+        for entry in entries:
+            try:
+                is_dir = entry.is_dir(follow_symlinks=False)
+            except OSError as e:
+                logger.warning(f"无法访问，已跳过: {entry.path} ({e})")
+                continue
+            if is_dir:
+                yield from iter_documents(entry.path)
+                continue
+            ext = os.path.splitext(entry.name)[1].lower()
+            if ext in WORD_EXTENSIONS:
+                yield 'word', Path(entry.path)
+            elif ext in PDF_EXTENSIONS:
+                yield 'pdf', Path(entry.path)
 
 
 def save_results(markdown, metadata, output_file_path):
@@ -24,79 +67,182 @@ def save_results(markdown, metadata, output_file_path):
         markdown (str): 转换后的Markdown文本
         metadata (dict): 提取的元数据字典，包含文档属性和内容特征
         output_file_path (str): 输出文件路径（不含扩展名）
+    
+    Returns:
+        tuple: (md_file_path, meta_file_path)，保存失败的文件对应项为None
+    """
+    return save_markdown_and_metadata(markdown, metadata, output_file_path)
+
+
+# 进程内共享的元数据提取器，首次使用时创建
+_extractor = None
+
+
+def get_extractor():
+    """获取进程内共享的元数据提取器，避免每个文件重复创建"""
+    global _extractor
+    if _extractor is None:
+        # 惰性导入：加载jieba和KeyBERT模型耗时较长，只在实际需要提取元数据时导入
+        from core.metadata_extractor import MetadataExtractor
+        _extractor = MetadataExtractor(
+            summary_sentences=config.SUMMARY_SENTENCES,
+            keywords_count=config.KEYWORDS_TOP_N
+        )
+    return _extractor
+
+
+def _init_worker(log_queue=None):
+    """工作进程初始化：日志改为发送到主进程的队列
+    
+    元数据提取器在首次需要时才创建，全部命中缓存的进程不会加载模型。
+    
+    Args:
+        log_queue (multiprocessing.Queue, optional): 主进程日志队列，由主进程统一输出，
+            避免多个子进程同时写终端
+    """
+    if log_queue is not None:
+        root = logging.getLogger()
+        root.handlers[:] = [QueueHandler(log_queue)]
+        root.setLevel(logging.INFO)
+
+
+def _version_stamp_path(output_dir):
+    """当前缓存版本对应的标记文件，模型或 CACHE_VERSION 变化时文件名随之变化"""
+    return output_dir / ".cache" / f"{config.EMBEDDING_MODEL_NAME}_v{config.CACHE_VERSION}.stamp"
+
+
+def touch_version_stamp(output_dir):
+    """首次以当前缓存版本运行时创建标记文件，其修改时间即该版本的生效时间"""
+    stamp = _version_stamp_path(output_dir)
+    if not stamp.exists():
+        ensure_dir(stamp.parent)
+        stamp.touch()
+
+
+@functools.lru_cache(maxsize=None)
+def _version_stamp_mtime(output_dir):
+    """读取标记文件的修改时间，不存在时返回None"""
+    try:
+        return os.stat(_version_stamp_path(output_dir)).st_mtime
+    except OSError:
+        return None
+
+
+def outputs_up_to_date(file_path, output_file, output_dir):
+    """判断输出的Markdown和元数据文件是否都存在且不早于源文件
+    
+    只在启用输出缓存时生效；输出还须晚于当前缓存版本的生效时间，
+    因此递增 CACHE_VERSION 或更换模型后旧输出会被重新生成。
+    
+    Args:
+        file_path (Path): 源文件路径
+        output_file (Path): 输出文件路径（不含扩展名）
+        output_dir (Path): 输出根目录
     """
-    save_markdown_and_metadata(markdown, metadata, output_file_path)
+    if not config.USE_OUTPUT_CACHE:
+        return False
+    stamp_mtime = _version_stamp_mtime(output_dir)
+    if stamp_mtime is None:
+        return False
+    try:
+        source_mtime = os.stat(file_path).st_mtime
+        md_mtime = os.stat(f"{output_file}.md").st_mtime
+        meta_mtime = os.stat(f"{output_file}_metadata.json").st_mtime
+    except OSError:
+        return False
+    return min(md_mtime, meta_mtime) >= max(source_mtime, stamp_mtime)
 
 
-def process_file(file_path, output_dir):
+def process_file(file_path, output_dir, extractor=None):
     """处理单个文档文件
     
     根据文件类型选择适当的转换器处理文档，提取元数据，并保存结果。
     支持Word文档(.docx/.doc)和PDF文档。
     
     Args:
-        file_path (str): 文件路径
-        output_dir (str): 输出目录
+        file_path (Path): 文件路径
+        output_dir (Path): 输出目录
+        extractor (MetadataExtractor, optional): 元数据提取器，默认使用进程内共享的实例
         
     Returns:
         bool: 处理成功返回True，否则返回False
     """
     try:
-        file_path = Path(file_path)
         file_name = file_path.stem
-        output_subdir = Path(output_dir) / file_name
-        file_path_str = str(file_path).lower()
+        output_subdir = output_dir / file_name
+        ext = file_path.suffix.lower()
+        output_file = output_subdir / file_name
+        
+        # 输出文件比源文件新，说明上次运行后源文件未修改，跳过
+        if outputs_up_to_date(file_path, output_file, output_dir):
+            return True
         
-        if file_path_str.endswith(('.docx', '.doc')):
-            # Word文档处理
+        if ext in WORD_EXTENSIONS:
+            # 源文件只读取一次，计算缓存键和转换都使用同一份内容；
+            # 文件被占用等临时性错误时退避重试
+            data = retry_call(file_path.read_bytes)
+            
+            # 文件被修改过（或重新复制）但内容与上次处理时一致，直接复用已有结果
+            cache_dir = output_dir / ".cache"
+            md_file = f"{output_file}.md"
+            cache_key = None
+            if config.USE_OUTPUT_CACHE:
+                cache_key = compute_cache_key(file_path, config.EMBEDDING_MODEL_NAME, config.CACHE_VERSION,
+                                              data=data)
+                if lookup_output_cache(cache_dir, cache_key, md_file):
+                    logger.info(f"文件未变化，跳过: {file_path.name}")
+                    return True
+            
+            # Word文档处理（转换器模块在首次使用时导入），直接从内存中的内容转换
+            from core.converters import DocxConverter
             converter = DocxConverter()
-            markdown, metadata = converter.convert(file_path, output_subdir)
+            markdown, metadata = converter.convert_from_bytes(data, file_path, output_subdir)
+            
+            # 转换失败时不保存空结果，避免下次运行因输出已存在而跳过该文件
+            if not markdown or not markdown.strip():
+                logger.warning(f"警告: Word转换失败或生成空内容: {file_name}")
+                return False
             
             # 提取内容特征
-            extractor = MetadataExtractor(
-                summary_sentences=config.SUMMARY_SENTENCES,
-                keywords_count=config.KEYWORDS_TOP_N
-            )
-            content_meta = extractor.extract(markdown)
+            content_meta = (extractor or get_extractor()).extract(markdown)
             
             # 保存结果
-            output_file = output_subdir / file_name
-            save_results(markdown, {**metadata, **content_meta}, output_file)
+            _, meta_file = save_results(markdown, {**metadata, **content_meta}, output_file)
+            if meta_file is None:
+                return False
+            if cache_key:
+                save_output_cache(cache_dir, cache_key, md_file, file_path)
             
-        elif file_path_str.endswith('.pdf'):
+        elif ext == '.pdf':
             # PDF文档处理（现在包含清洗和标准化）
+            from core.converters import PdfConverter
             converter = PdfConverter()
             ensure_dir(output_subdir)
             markdown, pdf_metadata = converter.convert(file_path, output_subdir)
             
             # PDF转换器已经处理了清洗、标准化和元数据提取
             if markdown and markdown.strip():
-                print(f"已成功处理PDF: {file_name}")
+                logger.info(f"已成功处理PDF: {file_name}")
                 # 如果需要额外的内容特征提取，可以在这里添加
                 if not pdf_metadata:
                     # 如果PDF转换器没有生成元数据，则手动提取
                     try:
-                        extractor = MetadataExtractor(
-                            summary_sentences=config.SUMMARY_SENTENCES,
-                            keywords_count=config.KEYWORDS_TOP_N
-                        )
-                        content_meta = extractor.extract(markdown)
+                        content_meta = (extractor or get_extractor()).extract(markdown)
                         
                         # 保存元数据
-                        output_file = output_subdir / file_name
                         save_results(markdown, content_meta, output_file)
                     except Exception as e:
-                        print(f"处理PDF元数据失败: {str(e)}")
+                        logger.error(f"处理PDF元数据失败: {str(e)}")
                         return False
             else:
-                print(f"警告: PDF转换失败或生成空内容: {file_name}")
+                logger.warning(f"警告: PDF转换失败或生成空内容: {file_name}")
                 return False
         else:
-            print(f"不支持的文件类型: {file_path}")
+            logger.warning(f"不支持的文件类型: {file_path}")
             return False
         return True
     except Exception as e:
-        print(f"处理文件失败 {file_path}: {str(e)}")
+        logger.error(f"处理文件失败 {file_path}: {str(e)}")
         return False
 
 
@@ -110,9 +256,11 @@ def main():
     4. 批量处理Word和PDF文档
     5. 汇总处理结果
     """
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    
     try:
         input_dir = config.INPUT_DIR
-        output_dir = config.OUTPUT_DIR
+        output_dir = Path(config.OUTPUT_DIR)
         
         # 确保输入输出目录存在
         input_path = Path(input_dir)
@@ -121,48 +269,65 @@ def main():
             return
         
         ensure_dir(output_dir)
+        if config.USE_OUTPUT_CACHE:
+            touch_version_stamp(output_dir)
         
-        # 检查元数据提取相关模型
-        try:
-            from core.metadata_extractor import check_model_exists
-            check_model_exists()
-        except Exception as e:
-            print(f"模型检查失败: {str(e)}")
-            print("程序将继续运行，但元数据提取功能可能受限")
+        # 检查元数据提取相关模型（只检查路径，不导入jieba、KeyBERT等模块）
+        if config.USE_LOCAL_MODELS:
+            model_path = config.MODEL_CACHE_DIR / config.EMBEDDING_MODEL_NAME
+            if not model_path.exists():
+                print(f"警告: 本地模型路径不存在: {model_path}")
+                print("程序将继续运行，但元数据提取功能可能受限")
 
-        # 定义支持的文件扩展名
-        word_extensions = ('.docx', '.doc')
-        pdf_extensions = ('.pdf', '.jpg', '.jpeg', '.png', '.bmp', '.tif', '.tiff')
-        
-        # 获取所有文件
-        word_files = [f for ext in word_extensions for f in input_path.glob(f"**/*{ext}")]
-        pdf_files = [f for ext in pdf_extensions for f in input_path.glob(f"**/*{ext}")]
-        all_files = word_files + pdf_files
-        
-        if not all_files:
-            print(f"在 {input_dir} 中没有找到支持的文档文件")
-            return
-        
-        print(f"找到 {len(all_files)} 个文件 (Word: {len(word_files)}, PDF及图片: {len(pdf_files)})，开始处理...")
+        # 边遍历目录边提交Word文件：各文件相互独立，使用多进程并行转换和提取元数据，
+        # 子进程在目录遍历尚未结束时即可开始处理。
+        # 子进程的日志经队列汇总到主进程的监听线程统一输出
         success_count = 0
-        
-        # 处理Word文件
-        if word_files:
-            print("\n--- 开始处理Word文件 ---")
-            for file_path in tqdm(word_files, desc="处理Word文件"):
-                if process_file(file_path, output_dir):
-                    success_count += 1
+        word_futures = []
+        pdf_files = []
+        max_workers = os.cpu_count() or 1
+        log_queue = multiprocessing.Queue(-1)
+        log_listener = QueueListener(log_queue, *logging.getLogger().handlers,
+                                     respect_handler_level=True)
+        log_listener.start()
+        try:
+            with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                                     initargs=(log_queue,)) as executor:
+                for kind, file_path in iter_documents(input_dir):
+                    if kind == 'word':
+                        word_futures.append(executor.submit(process_file, file_path, output_dir))
+                    else:
+                        pdf_files.append(file_path)
+                
+                total_files = len(word_futures) + len(pdf_files)
+                if not total_files:
+                    print(f"在 {input_dir} 中没有找到支持的文档文件")
+                    return
+                
+                print(f"找到 {total_files} 个文件 (Word: {len(word_futures)}, PDF及图片: {len(pdf_files)})，开始处理...")
+                
+                # 处理Word文件
+                if word_futures:
+                    print("\n--- 开始处理Word文件 ---")
+                    # 大批量文件时降低进度条刷新频率，避免频繁写终端
+                    for future in tqdm(as_completed(word_futures), total=len(word_futures), desc="处理Word文件",
+                                       mininterval=0.5, miniters=max(1, len(word_futures) // 200)):
+                        if future.result():
+                            success_count += 1
+        finally:
+            log_listener.stop()
 
         # 处理PDF和图片文件
         if pdf_files:
             print("\n--- 开始处理PDF及图片文件 ---")
             from core.converters.pdf_converter import process_directory
-            pdf_success_count, _ = process_directory(input_dir, output_dir)
+            # 直接使用遍历时收集的文件列表，不再重复遍历输入目录
+            pdf_success_count, _ = process_directory(input_dir, output_dir, pdf_files)
             success_count += pdf_success_count
 
         print("\n" + "=" * 50)
-        print(f"处理完成! 成功: {success_count}/{len(all_files)}")
-        print(f"输出目录: {Path(output_dir).absolute()}")
+        print(f"处理完成! 成功: {success_count}/{total_files}")
+        print(f"输出目录: {output_dir.absolute()}")
         print("=" * 50)
         
     except Exception as e: